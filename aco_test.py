@@ -1,7 +1,18 @@
 from evo.ants import ContinuousACO
 from evo.functions import rastrigin, ackley, sphere
+from evo.plot import EvoPlot
 
 if __name__ == '__main__':
     aco = ContinuousACO()
 
-    aco.solve(function=rastrigin, domain=(-100, 100))
+    best = aco.optimize(
+                function=rastrigin,
+                lower_bounds=[-100, -100],
+                upper_bounds=[100, 100],
+                dimensions=2)
+
+    print best
+
+    plot = EvoPlot(aco.generations)
+
+    plot.animate()
@@ -8,7 +8,8 @@ if __name__ == '__main__':
     best = bfoa.optimize(
                 function=rastrigin,
                 lower_bounds=[-50, -50],
-                upper_bounds=[50, 50])
+                upper_bounds=[50, 50],
+                dimensions=2)
 
     print best
 
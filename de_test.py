@@ -5,7 +5,7 @@ from evo.plot import EvoPlot
 if __name__ == '__main__':
     de = DifferentialEvolution()
 
-    best = de.optimize(function=rastrigin)
+    best = de.optimize(function=rastrigin, dimensions=2)
 
     plot = EvoPlot(de.generations)
 
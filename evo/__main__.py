@@ -0,0 +1,4 @@
+from experiments import main
+
+if __name__ == '__main__':
+    main()
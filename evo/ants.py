@@ -1,16 +1,25 @@
-import math
-import random
+import numpy as np
 
-from evo import EvolutionaryAlgorithm
-from tools import RandomSelector, Interval
+from evo import EvolutionaryAlgorithm as EA
+from population import Population
+from tools import RandomSelector
 
-class ContinuousACO(EvolutionaryAlgorithm):
+class ContinuousACO(EA):
     """Continuous Ant Colony Optimization.
 
     A simple ant system for solving a continuous-domain problem in a n-dimensional
-    space.
+    space. The range of each parameter is divided in num_intervals intervals,
+    each with an amount of pheromones; each ant picks an interval per parameter,
+    with probability proportional to its pheromones, and a random value within
+    it. Then the ants deposit pheromones on the intervals they visited, more
+    the better their solutions.
+
+    The pheromones are kept in a (dimensions, num_intervals) matrix, and the
+    interval picks and deposits are computed for all the ants at once.
     """
 
+    _PHASES = EA._PHASES + ('_construct', '_update_pheromones')
+
     def __init__(
             self,
             population_size=100,
@@ -21,7 +30,7 @@ class ContinuousACO(EvolutionaryAlgorithm):
             initial_pheromone=1e-5,
             num_intervals=40):
 
-        EvolutionaryAlgorithm.__init__(self, population_size, 0, num_elites)
+        EA.__init__(self, population_size, 0, num_elites)
 
         self.pheromone_importance = pheromone_importance
         self.evaporation_rate = evaporation_rate
@@ -29,97 +38,140 @@ class ContinuousACO(EvolutionaryAlgorithm):
         self.initial_pheromone = initial_pheromone
         self.num_intervals = num_intervals
 
-        self.pheromones = []
+        self.pheromones = None
+
+    def _init_algorithm(self):
+        # sets the initial pheromone amount for each interval in each dimension
+        self.pheromones = np.full((self._dimensions, self.num_intervals),
+                                  float(self.initial_pheromone))
+
+        self._widths = ((self._upper_bounds - self._lower_bounds)
+                        / float(self.num_intervals))
+
+        self._init_population()
+
+    def _evolve(self):
+        # the elite ants are placed back in the colony
+        population = self._pick_elites()
+        population.append(Population(
+                            self._construct(self._population_size - self._num_elites),
+                            self._population.dtype))
+
+        self._population = population
 
-    def evolve(self, max_generations):
-        self.discretize()
-        self.init_pheromones()
-        self.init_population()
-        self.elite_ants = []
-        self.best_ant = None
+        self._update_pheromones(self._evaluate_population())
 
-        for generation in range(max_generations):
-            selectors = []
+    def _construct(self, count):
+        """Returns count new solutions built from the pheromones."""
 
-            # set the probabilities for each interval in each dimension
-            for dimension in self.dimensions:
-                selector = RandomSelector()
+        dimensions, intervals = self.pheromones.shape
 
-                for i, pheromone in enumerate(self.pheromones[dimension]):
-                    # the weight indicates the relative probability for the
-                    # interval to be selected, which is proportional to its
-                    # amount of pheromones.
-                    weight = math.pow(pheromone, self.pheromone_importance)
-                    selector.add(self.intervals[i], weight)
+        # the weight indicates the relative probability for the interval to be
+        # selected, which is proportional to its amount of pheromones
+        weights = self.pheromones**self.pheromone_importance
+        cumulative = np.cumsum(weights, axis=1)
+        cumulative /= cumulative[:, -1:]
 
-                selectors.append(selector)
+        # the cumulative probabilities of each dimension are offset by the
+        # dimension number, so the intervals of all of them are searched at once
+        offsets = np.arange(dimensions)
 
-            for ant in self.population:
-                for dimension in self.dimensions:
-                    # randomly select an interval on this dimension
-                    interval = selectors[dimension].choose()
+        picks = self.random.random_sample((count, dimensions)) + offsets
 
-                    # set the solution within the selected interval
-                    ant[dimension] = random.uniform(interval.min, interval.max)
+        chosen = np.searchsorted((cumulative + offsets[:, np.newaxis]).ravel(),
+                                 picks,
+                                 side='right')
+        chosen = np.clip(chosen - offsets * intervals, 0, intervals - 1)
 
-            # place elite ants back to the colony
-            self.population.extend(self.elite_ants)
+        # set the solutions within the selected intervals
+        return (self._lower_bounds
+                + (chosen + self.random.random_sample((count, dimensions))) * self._widths)
 
-            deposited_pheromones = map(self.deposited_pheromones, self.population)
+    def _update_pheromones(self, values):
+        """Evaporates the pheromones and deposits those of the population."""
 
-            # evaporation and deposition of pheromones
-            for dimension in self.dimensions:
-                pheromones = self.pheromones[dimension]
+        dimensions, intervals = self.pheromones.shape
 
-                for i, interval in enumerate(self.intervals):
-                    # evaporate pheromones of interval
-                    pheromones[i] *= 1 - self.evaporation_rate
+        # the intervals visited by each ant in each dimension
+        edges = np.arange(1, intervals)
+        visited = np.digitize((self._population.vectors - self._lower_bounds)
+                              / self._widths,
+                              edges)
 
-                    # deposit pheromones in visitied intervals
-                    for k, ant in enumerate(self.population):
-                        if  interval.min <= ant[dimension] < interval.max:
-                            pheromones[i] += deposited_pheromones[k]
+        deposits = self.deposition_constant / self._cost(values)
 
+        deposited = np.bincount(
+                        (visited + np.arange(dimensions) * intervals).ravel(),
+                        weights=np.repeat(deposits, dimensions),
+                        minlength=dimensions * intervals)
 
-            self.evaluate_generation()
+        self.pheromones *= 1 - self.evaporation_rate
+        self.pheromones += deposited.reshape(dimensions, intervals)
 
-            self.set_results(
-                    generation,
-                    self.population[:],
-                    self.best_ant,
-                    self.evaluate(self.best_ant))
+class ArchiveACO(EA):
+    """Ant Colony Optimization for continuous domains (ACO_R).
+
+    The population is an archive of the best solutions found, sorted by value.
+    Each ant picks a solution of the archive as a guide, the better ranked ones
+    being more likely, and samples a new solution from a Gaussian centered on
+    it, whose width on each parameter is the average distance from the guide to
+    the rest of the archive. The archive then keeps the best of its solutions
+    and those of the ants. The solutions are clipped to the bounds.
+
+    Arguments:
+    population_size -- number of solutions in the archive (default 50)
+    num_ants -- number of solutions sampled on each generation (default 20)
+    locality -- how much the best ranked solutions are preferred as guides;
+                the smaller, the more (default 0.1)
+    convergence -- scale of the Gaussian widths; the smaller, the faster the
+                   archive converges (default 0.85)
+    """
+
+    def __init__(
+            self,
+            population_size=50,
+            num_ants=20,
+            locality=0.1,
+            convergence=0.85):
 
-        return self.best_ant
+        EA.__init__(self, population_size, 0, 0)
 
-    def discretize(self):
-        """Divides the problem's domain into discretized intervals."""
+        self.num_ants = num_ants
+        self.locality = locality
+        self.convergence = convergence
 
-        self.intervals = []
+    def _init_algorithm(self):
+        size = self._population_size
 
-        step = (self.domain.max - self.domain.min) / float(self.num_intervals)
+        # the weight of each rank of the archive, which follows a Gaussian
+        ranks = np.arange(size)
+        scale = self.locality * size
 
-        for i in range(self.num_intervals):
-            start = self.domain.min + step * i
-            end = start + step
+        self._selector = RandomSelector(self.random)
+        self._selector.assign(zip(ranks, np.exp(-ranks**2 / (2.0 * scale**2))))
 
-            self.intervals.append(Interval(start, end))
+        self._init_population()
 
-    def init_pheromones(self):
-        """Sets the initial pheromone amount for each discrete interval in each dimension."""
+    def _evolve(self):
+        archive = self._population
+        vectors = archive.vectors
 
-        self.pheromones = [[self.initial_pheromone for interval in self.intervals]
-                           for dimension in self.dimensions]
+        guides = np.array(self._selector.choose(self.num_ants))
 
-    def deposited_pheromones(self, ant):
-        """Calculates the ammount of pheromones deposited by an ant."""
+        # mean distance from each guide to the rest of the archive, per
+        # parameter
+        widths = (self.convergence
+                  * np.abs(vectors[guides][:, np.newaxis] - vectors).sum(axis=1)
+                  / (len(archive) - 1))
 
-        return self.deposition_constant / self.cost(ant)
+        ants = np.clip(self.random.normal(vectors[guides], widths),
+                       self._lower_bounds,
+                       self._upper_bounds)
 
-    def evaluate_generation(self):
-        self.sort_population()
+        archive.append(Population(ants, archive.dtype))
 
-        self.best_ant = self.population[0]
+        # the archive keeps the best solutions
+        values = self._evaluate_population()
 
-        # get elite ants and remove them from population
-        self.elite_ants = self.population[:self.num_elites]
-        self.population = self.population[self.num_elites:]
+        archive.reorder(np.argsort(self._objective(values),
+                                   kind='mergesort')[:self._population_size])
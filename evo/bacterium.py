@@ -1,17 +1,30 @@
-import math
 import numpy as np
-import copy
-import random
-from evo import EvolutionaryAlgorithm as EA, Generation, Individual
+from evo import EvolutionaryAlgorithm as EA, Generation, State
+from history import create_history
 
-class Cell(Individual):
-    def __init__(self, vector):
-        Individual.__init__(self, vector)
+class BacterialForaging(EA):
+    """Bacterial Foraging Optimization.
 
-        self.cost = 0
-        self.avg_cost = 0
+    The cell-to-cell signal felt by each cell is kept in a matrix with the
+    signal between every pair of cells, whose rows are updated as the cells
+    swim.
+
+    Arguments:
+    interaction_radius -- if given, cells farther than this distance are
+                          ignored by the cell-to-cell signal, and the cells in
+                          range are found with a sweep along one axis instead
+                          of keeping the whole matrix, which is better for big
+                          colonies (default None)
+    """
+
+    # number of positions whose signal is computed at once when the
+    # interaction radius is given
+    _BLOCK_SIZE = 256
+
+    _PHASES = EA._PHASES + ('_chemotaxis', '_reproduce', '_eliminate',
+                            '_build_signals', '_update_signals',
+                            '_interactions')
 
-class BacterialForaging(EA):
     def __init__(
             self,
             step_size=0.2   ,
@@ -24,7 +37,8 @@ class BacterialForaging(EA):
             repulsion_depth=1,
             attraction_width=0.2,
             repulsion_width=10,
-            elimination_probability=0.25):
+            elimination_probability=0.25,
+            interaction_radius=None):
 
         EA.__init__(self, population_size, 0, 0)
 
@@ -38,101 +52,350 @@ class BacterialForaging(EA):
         self._attraction_width = attraction_width
         self._repulsion_width = repulsion_width
         self._elimination_probability = elimination_probability
+        self._interaction_radius = interaction_radius
 
     def optimize(
             self,
             function,
             lower_bounds=[],
             upper_bounds=[],
-            problem_type='min'):
+            problem_type='min',
+            vectorized=False,
+            dtype=np.float64,
+            evaluator=None,
+            history='full',
+            termination=None,
+            dimensions=None,
+            checkpoint=None):
+
+        # a generation is recorded on each chemotaxis step
+        if checkpoint is None or not checkpoint.exists():
+            self.generations = create_history(history)
+            self.generations.reserve(self._elimination_steps
+                                     * self._reproduction_steps
+                                     * self._chemotaxis_steps)
+
+        states = self.optimize_iter(
+                        function,
+                        lower_bounds,
+                        upper_bounds,
+                        problem_type,
+                        vectorized,
+                        dtype,
+                        evaluator,
+                        termination,
+                        dimensions,
+                        checkpoint)
+
+        try:
+            for state in states:
+                self._record_generation(state.generation)
+        finally:
+            self.generations.close()
+
+        return self._best()
+
+    def optimize_iter(
+            self,
+            function,
+            lower_bounds=[],
+            upper_bounds=[],
+            problem_type='min',
+            vectorized=False,
+            dtype=np.float64,
+            evaluator=None,
+            termination=None,
+            dimensions=None,
+            checkpoint=None):
+        """Like optimize, but yields a State after each chemotaxis step.
+
+        The termination criteria are checked, and the checkpoint saved, after
+        each chemotaxis step too.
+        """
+
+        self._set_problem(
+                function,
+                lower_bounds,
+                upper_bounds,
+                problem_type,
+                vectorized,
+                evaluator,
+                dimensions)
+
+        self._dtype = dtype
+
+        self._set_termination(termination)
+
+        try:
+            if checkpoint is not None and checkpoint.exists():
+                self._restore(checkpoint.load())
+            else:
+                self._init_algorithm()
+
+            if checkpoint is not None:
+                checkpoint.start(self._step)
+
+            for state in self._forage():
+                self._check_termination(state)
+
+                yield state
 
-        self._set_problem(function, lower_bounds, upper_bounds, problem_type)
+                if self.stop_reason:
+                    return
+
+                self._save_checkpoint(checkpoint, self._step)
+
+            self.stop_reason = 'max_generations'
+        finally:
+            self._evaluator.close()
+
+    def _init_algorithm(self):
         self._init_population()
 
-        self.generations = []
+        self._step = 0
+        self._global_best = None
+
+        # the steps done of each loop, kept as attributes, rather than loop
+        # variables, so a checkpoint can resume the loops where they were
+        self._elimination_count = 0
+        self._reproduction_count = 0
+        self._chemotaxis_count = 0
+
+    def _forage(self):
+        # each chemotaxis step is done, and its counters advanced, before it is
+        # yielded; the end of the loops it completes is handled on the next one
+        while True:
+            if self._chemotaxis_count == self._chemotaxis_steps:
+                self._reproduce()
+
+                self._chemotaxis_count = 0
+                self._reproduction_count += 1
+
+            if self._reproduction_count == self._reproduction_steps:
+                self._eliminate()
+
+                self._reproduction_count = 0
+                self._elimination_count += 1
 
-        global_best = None
+            if self._elimination_count == self._elimination_steps:
+                return
 
-        for l in range(self._elimination_steps):
-            print len(self._population)
-            for k in range(self._reproduction_steps):
-                best = self._chemotaxis()
+            if self._chemotaxis_count == 0:
+                # the cells were reordered or moved since the last step
+                self._build_signals()
 
-                # update global best
-                if not global_best or best.cost < global_best.cost:
-                    global_best = best
+            self._chemotaxis()
 
-                # sort by averange effective cost
-                self._population.sort(key=lambda cell: cell.cost)
+            state = self._get_state(self._step)
 
-                # eliminate worst individuals and clone the best
-                best = self._population[:self._population_size/2]
+            self._step += 1
+            self._chemotaxis_count += 1
 
-                self._population = best + best
+            yield state
 
-            for cell in self._population:
-                if random.random() <= self._elimination_probability:
-                    cell.vector = EA._rand_individual(self)
+    def _reproduce(self):
+        # sort by averange effective cost, eliminate worst individuals and clone
+        # the best
+        survivors = np.argsort(self._population.costs, kind='mergesort')
+        survivors = survivors[:self._population_size/2]
 
-        return global_best.vector
+        self._population.reorder(np.concatenate((survivors, survivors)))
+
+    def _eliminate(self):
+        eliminated = (self.random.random_sample(len(self._population))
+                      <= self._elimination_probability)
+
+        self._population.set_vectors(
+                            eliminated,
+                            self._rand_vectors(eliminated.sum()))
+
+    def _init_population(self):
+        EA._init_population(self)
+
+        self._population.add_field('costs')
+        self._population.add_field('avg_costs')
 
     def _evolve(self):
         return
 
     def _chemotaxis(self):
-        for j in range(self._chemotaxis_steps):
-            best = None
+        """Does a chemotaxis step."""
+
+        population = self._population
+
+        population.costs[:] = (self._cost(self._evaluate_population())
+                               + self._population_interactions())
+
+        best = population.take([np.argmin(population.costs)])
+
+        population.avg_costs[:] = population.costs
+
+        # every cell tumbles to a random direction and keeps swimming on it
+        # while its cost improves; the swimming cells are evaluated at once
+        # on each step
+        directions = self._rand_unit_vectors(len(population))
+        swimming = np.arange(len(population))
+
+        for m in range(self._reduction_steps):
+            if not len(swimming):
+                break
+
+            others = (population.vectors[swimming]
+                      + self._step_size * directions[swimming])
+
+            values = self._evaluate_vectors(others)
+
+            if self._interaction_radius is None:
+                # the signals on the new positions become the rows of the
+                # cells that move
+                signals = self._signal(
+                            _squared_distances(others, population.vectors))
+                costs = self._cost(values) + signals.sum(axis=1)
+            else:
+                costs = self._effective_costs(others, values)
+
+            improved = costs < population.costs[swimming]
+            swimming = swimming[improved]
+
+            population.set_vectors(swimming, others[improved], values[improved])
+
+            if self._interaction_radius is None:
+                self._update_signals(swimming, signals[improved])
+
+            population.costs[swimming] = costs[improved]
+            population.avg_costs[swimming] += costs[improved]
+
+        self._step_best = best
+
+        # update global best
+        if (self._global_best is None
+                or best.costs[0] < self._global_best.costs[0]):
+            self._global_best = best
+
+    def _replace(self, rows, vectors, values):
+        # the cells are not kept sorted, but the signals must be updated
+        self._population.set_vectors(rows, vectors, values)
+
+        self._build_signals()
+
+        # the new cells are ranked by their own costs on the next reproduction
+        costs = self._effective_costs(vectors, values)
+
+        self._population.costs[rows] = costs
+        self._population.avg_costs[rows] = costs
+
+    def _best(self):
+        return np.array(self._global_best.vectors[0])
+
+    def _get_state(self, generation):
+        best = self._step_best
+
+        return State(generation, np.array(best.vectors[0]), best.values[0],
+                     self.evaluations)
+
+    def _get_generation(self):
+        best = self._step_best
+
+        return Generation(
+                    self._population.vectors,
+                    (best.vectors[0], best.values[0]),
+                    self._population.values)
+
+    def _effective_costs(self, vectors, values):
+        return self._cost(values) + self._interactions(vectors)
+
+    def _signal(self, distances):
+        """Computes the attraction and repulsion signal between cells from the
+        squared distances between them.
+        """
+
+        signal = (self._repulsion_depth * np.exp(-self._repulsion_width * distances)
+                  - self._attraction_depth * np.exp(-self._attraction_width * distances))
+
+        if self._interaction_radius is not None:
+            signal[distances > self._interaction_radius**2] = 0
+
+        return signal
+
+    def _build_signals(self):
+        """Computes the signal between every pair of cells of the population."""
+
+        if self._interaction_radius is None:
+            vectors = self._population.vectors
+
+            self._signals = self._signal(_squared_distances(vectors, vectors))
+
+    def _update_signals(self, rows, signals):
+        """Updates the signal matrix after the cells of the given rows moved.
+
+        signals are the signals on the new positions of the cells, computed
+        before they moved, so only those between the moved cells are stale.
+        """
+
+        vectors = self._population.vectors[rows]
+
+        signals[:, rows] = self._signal(_squared_distances(vectors, vectors))
+
+        self._signals[rows] = signals
+        self._signals[:, rows] = signals.T
 
-            for cell in self._population:
-                self._compute_effective_cost(cell)
+    def _population_interactions(self):
+        """Computes the cell-to-cell signal felt by each cell of the population."""
 
-                if not best or cell.cost < best.cost:
-                    best = copy.deepcopy(cell)
+        if self._interaction_radius is None:
+            return self._signals.sum(axis=1)
 
-                cell.avg_cost = cell.cost
-                v = self._rand_unit_vector()
+        return self._interactions(self._population.vectors)
 
-                for m in range(self._reduction_steps):
-                    # tumble cell
-                    other = Cell(cell.vector + self._step_size * v)
+    def _interactions(self, vectors):
+        """Computes the cell-to-cell signal the population exerts on cells at
+        the given positions.
+        """
 
-                    self._compute_effective_cost(other)
+        population = self._population.vectors
 
-                    if other.cost < cell.cost:
-                        cell.vector = other.vector
-                        cell.cost = other.cost
+        if self._interaction_radius is None:
+            return self._signal(_squared_distances(vectors, population)).sum(axis=1)
 
-                        cell.avg_cost += cell.cost
-                    else:
-                        break
+        # cells are sorted along the axis where they are most spread, so only
+        # those between the coordinates of a block of positions, give or take
+        # the radius, can be in range of any of them
+        axis = np.argmax(np.ptp(population, axis=0))
+        radius = self._interaction_radius
 
-            population = [copy.deepcopy(cell.vector)
-                          for cell in self._population]
+        cells = population[np.argsort(population[:, axis], kind='mergesort')]
+        coordinates = cells[:, axis]
 
-            generation = Generation(population, (best.vector, self._evaluate(best)))
+        order = np.argsort(vectors[:, axis], kind='mergesort')
+        interactions = np.zeros(len(vectors))
 
-            self.generations.append(generation)
+        for start in range(0, len(vectors), self._BLOCK_SIZE):
+            block = order[start:start + self._BLOCK_SIZE]
 
-        return best
+            lower = np.searchsorted(coordinates,
+                                    vectors[block[0], axis] - radius,
+                                    side='left')
+            upper = np.searchsorted(coordinates,
+                                    vectors[block[-1], axis] + radius,
+                                    side='right')
 
-    def _compute_effective_cost(self, cell):
-        sum = 0
+            distances = _squared_distances(vectors[block], cells[lower:upper])
 
-        for other in self._population:
-            diff = np.ndarray.sum((cell.vector - other.vector)**2)
+            interactions[block] = self._signal(distances).sum(axis=1)
 
-            sum += (self._repulsion_depth * math.exp(-self._repulsion_width * diff)
-                    - self._attraction_depth * math.exp(-self._attraction_width * diff))
+        return interactions
 
-        cell.cost =  self._cost(cell) + sum
+    def _rand_unit_vectors(self, count):
+        v = self.random.uniform(-1, 1, (count, self._dimensions))
 
-    def _rand_unit_vector(self):
-        v = np.random.uniform(-1, 1, self._dimensions)
+        return v / np.linalg.norm(v, axis=1, keepdims=True)
 
-        return v / np.linalg.norm(v)
+def _squared_distances(a, b):
+    """Computes the squared distances between every row of a and of b."""
 
-    def _rand_individual(self):
-        return Cell(EA._rand_individual(self))
+    distances = (np.sum(a**2, axis=1)[:, np.newaxis]
+                 + np.sum(b**2, axis=1)
+                 - 2 * np.dot(a, b.T))
 
-    def _evaluate(self, cell):
-        return self._function(*cell.vector)
+    # rounding errors may give small negative distances
+    return np.maximum(distances, 0)
@@ -1,14 +1,12 @@
-import copy
-import random
-from evo import EvolutionaryAlgorithm as EA, Generation
+import numpy as np
+from evo import EvolutionaryAlgorithm as EA
+from population import Population
 from tools import RandomSelector
 
-class ForagerBee():
-    def __init__(self, position):
-        self.position = position
-        self.trial_count = 0
-
 class ArtificialBeeColony(EA):
+    _PHASES = EA._PHASES + ('_do_forager_phase', '_do_onlooker_phase',
+                            '_do_scout_phase')
+
     def __init__(
             self,
             population_size=100):
@@ -18,16 +16,23 @@ class ArtificialBeeColony(EA):
         self._foragers_size = self._population_size / 2
         self._onlookers_size = self._foragers_size
 
-        self._foragers = []
-
     def _init_algorithm(self):
         self._stagnation_limit = self._population_size * self._dimensions / 2
 
-        self._init_foragers()
+        self._init_population()
+
+    def _init_population(self):
+        # the food sources are tracked by the foragers, so they make up the
+        # population of the colony; each row is a forager
+        self._population = Population(
+                                self._rand_vectors(self._foragers_size),
+                                self._dtype)
 
-    def _init_foragers(self):
-        self._foragers = [self._rand_forager()
-                          for i in range(self._foragers_size)]
+        self._population.add_field('trial_counts', dtype=int)
+
+        # the fitness of each food source, computed once its value is known and
+        # updated only when the source improves
+        self._population.add_field('fitnesses', fill=np.nan)
 
     def _evolve(self):
         self._do_forager_phase()
@@ -35,66 +40,96 @@ class ArtificialBeeColony(EA):
         self._do_scout_phase()
 
     def _do_forager_phase(self):
-        for forager in self._foragers:
-            self._forager_search(forager)
+        self._forager_search(np.arange(len(self._population)))
 
     def _do_onlooker_phase(self):
-        selector = RandomSelector()
+        selector = RandomSelector(self.random)
 
-        for forager in self._foragers:
-            selector.add(forager, self._fitness(forager))
+        selector.assign(zip(range(len(self._population)),
+                            self._forager_fitnesses()))
 
-        for i in range(self._onlookers_size):
-            forager = selector.choose()
+        foragers = np.array(selector.choose(self._onlookers_size), dtype=int)
 
-            self._forager_search(forager)
+        self._forager_search(foragers)
 
     def _do_scout_phase(self):
-        for forager in self._foragers:
-            if forager.trial_count > self._stagnation_limit:
-                forager.position = EA._rand_individual(self)
-                forager.trial_count = 0
+        population = self._population
+
+        exhausted = population.trial_counts > self._stagnation_limit
+
+        population.set_vectors(exhausted, self._rand_vectors(exhausted.sum()))
+        population.trial_counts[exhausted] = 0
+        population.fitnesses[exhausted] = np.nan
+
+    def _replace(self, rows, vectors, values):
+        self._population.trial_counts[rows] = 0
+        self._population.fitnesses[rows] = np.nan
+
+        EA._replace(self, rows, vectors, values)
+
+    def _forager_search(self, foragers):
+        """Tries a neighbor of the food source of each of the given foragers,
+        which may repeat, and keeps the ones that improve.
+        """
+
+        population = self._population
+
+        fitnesses = self._forager_fitnesses()
+
+        # evaluate all the trials at once
+        trials = self._trials(foragers)
+        trial_values = self._evaluate_vectors(trials)
+        trial_fitnesses = self._fitness(trial_values)
+
+        # the onlookers may repeat foragers, so only the best trial of each
+        # forager competes with its food source
+        order = np.lexsort((-trial_fitnesses, foragers))
+
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = foragers[order][1:] != foragers[order][:-1]
 
-    def _forager_search(self, forager):
-        choice = forager
+        best = order[first]
+        best = best[trial_fitnesses[best] > fitnesses[foragers[best]]]
 
-        while choice is forager:
-            choice = random.choice(self._foragers)
+        improved = foragers[best]
 
-        d = random.randrange(self._dimensions)
-        r = random.uniform(-1, 1)
+        np.add.at(population.trial_counts, foragers, 1)
 
-        trial = ForagerBee(copy.copy(forager.position))
+        population.set_vectors(improved, trials[best], trial_values[best])
+        population.fitnesses[improved] = trial_fitnesses[best]
+        population.trial_counts[improved] = 0
 
-        trial.position[d] = (forager.position[d]
-                             + r * (forager.position[d] - choice.position[d]))
+    def _trials(self, foragers):
+        """Returns a trial food source for each forager, which differs from
+        its source in one parameter, moved relative to another random source.
+        """
 
-        if self._fitness(trial) > self._fitness(forager):
-            forager.position = trial.position
-            forager.trial_count = 0
-        else:
-            forager.trial_count += 1
+        vectors = self._population.vectors
+        count = len(foragers)
 
-    def _rand_forager(self):
-        position = EA._rand_individual(self)
+        # partners are drawn among the other foragers
+        partners = self.random.randint(len(vectors) - 1, size=count)
+        partners += partners >= foragers
 
-        return ForagerBee(position)
+        d = self.random.randint(self._dimensions, size=count)
+        r = self.random.uniform(-1, 1, count)
 
-    def _sort_population(self):
-        is_maximize = self._problem_type == 'max'
+        trials = vectors[foragers]
 
-        self._foragers.sort(key=self._evaluate, reverse=is_maximize)
+        trials[np.arange(count), d] += r * (vectors[foragers, d]
+                                            - vectors[partners, d])
 
-    def _evaluate(self, bee):
-        return self._function(*bee.position)
+        return trials
 
-    def _best(self):
-        return self._foragers[0].position
+    def _forager_fitnesses(self):
+        """Returns the fitness of each food source, computing only the ones
+        which are not known.
+        """
 
-    def _get_generation(self):
-        positions = [copy.copy(bee.position)
-                     for bee in self._foragers]
+        population = self._population
+        values = self._evaluate_population()
 
-        best = positions[0]
+        pending = np.isnan(population.fitnesses)
+        population.fitnesses[pending] = self._fitness(values[pending])
 
-        return Generation(positions, (best, self._function(*best)))
+        return population.fitnesses
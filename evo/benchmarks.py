@@ -0,0 +1,278 @@
+import sys
+import json
+import time
+import inspect
+import argparse
+import platform
+import resource
+import multiprocessing
+import numpy as np
+
+from functions import sphere
+from experiments import ALGORITHMS
+
+# the algorithms benchmarked by default
+DEFAULT_ALGORITHMS = ['ga', 'de', 'pso', 'abc', 'bfoa', 'aco']
+
+# the measures of a case, and whether larger values are better
+MEASURES = {
+    'time_per_generation': False,
+    'evaluations_per_second': True,
+    'peak_memory': False,
+    'overhead_per_generation': False
+}
+
+def run_suite(
+        algorithms=DEFAULT_ALGORITHMS,
+        sizes=[50, 500],
+        dimensions=[2, 30],
+        generations=50,
+        repeats=3,
+        seed=0):
+    """Benchmarks each algorithm with each population size and number of
+    dimensions on the sphere function; returns the results as a dict, which
+    can be saved as a baseline.
+
+    Each case runs repeats times, from the same seed, in a fresh process, so
+    its peak memory is not affected by the other cases; the fastest run is
+    kept. The measures of each case are:
+
+    time_per_generation -- wall time of a generation, in seconds
+    evaluations_per_second -- objective evaluations per second of wall time
+    peak_memory -- peak resident memory of the process, in kilobytes
+    overhead_per_generation -- time of a generation spent outside the objective
+                               function, in seconds
+    """
+
+    cases = [{'algorithm': algorithm,
+              'population_size': size,
+              'dimensions': count,
+              'generations': generations,
+              'repeats': repeats,
+              'seed': seed}
+             for algorithm in algorithms
+             for size in sizes
+             for count in dimensions]
+
+    results = []
+
+    for case in cases:
+        # a new process for each case, one after the other, so the timings do
+        # not compete for the CPU
+        pool = multiprocessing.Pool(1)
+
+        try:
+            results.append(pool.apply(_run_case, (case,)))
+        finally:
+            pool.close()
+            pool.join()
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cases': results
+    }
+
+def compare(baseline, current, threshold=0.1):
+    """Compares the cases of two suite results.
+
+    Returns a list of (case, measure, baseline value, current value, change,
+    regression) with the measures of the cases in both, where change is the
+    relative change, positive when the current value is worse, and regression
+    tells if it is above threshold.
+    """
+
+    baseline_cases = dict((_case_key(case), case) for case in baseline['cases'])
+
+    comparison = []
+
+    for case in current['cases']:
+        old = baseline_cases.get(_case_key(case))
+
+        if old is None:
+            continue
+
+        for measure, larger_is_better in sorted(MEASURES.items()):
+            before, after = old[measure], case[measure]
+
+            if before:
+                change = float(after - before) / before
+            else:
+                change = 0.0
+
+            if larger_is_better:
+                change = -change
+
+            comparison.append((case, measure, before, after, change,
+                               change > threshold))
+
+    return comparison
+
+class _TimedFunction:
+    """Adds up the time spent in a function."""
+
+    def __init__(self, function):
+        self.function = function
+        self.time = 0
+
+    def __call__(self, vectors):
+        start = time.time()
+
+        try:
+            return self.function(vectors)
+        finally:
+            self.time += time.time() - start
+
+def _run_case(case):
+    best = None
+
+    for repeat in range(case['repeats']):
+        measures = _measure(case)
+
+        if best is None or measures['time'] < best['time']:
+            best = measures
+
+    generations = best['generations']
+
+    result = dict(case)
+    result.update({
+        'time_per_generation': best['time'] / generations,
+        'evaluations_per_second': best['evaluations'] / best['time'],
+        'peak_memory': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'overhead_per_generation': (best['time'] - best['objective_time'])
+                                   / generations
+    })
+
+    return result
+
+def _measure(case):
+    name = case['algorithm']
+
+    if name == 'bfoa':
+        # a generation is a chemotaxis step
+        algorithm = ALGORITHMS[name](population_size=case['population_size'],
+                                     chemotaxis_steps=case['generations'],
+                                     reproduction_steps=1,
+                                     elimination_steps=1)
+    else:
+        algorithm = ALGORITHMS[name](population_size=case['population_size'])
+
+    algorithm.seed(case['seed'])
+
+    function = _TimedFunction(sphere)
+
+    arguments = {
+        'function': function,
+        'lower_bounds': [-100] * case['dimensions'],
+        'upper_bounds': [100] * case['dimensions'],
+        'vectorized': True,
+        'max_generations': case['generations']
+    }
+
+    accepted = inspect.getargspec(algorithm.optimize_iter).args
+
+    arguments = dict((name, value) for name, value in arguments.items()
+                     if name in accepted)
+
+    start = time.time()
+
+    # the first state is the initial population
+    states = sum(1 for state in algorithm.optimize_iter(**arguments))
+
+    elapsed = time.time() - start
+
+    return {
+        'time': elapsed,
+        'objective_time': function.time,
+        'evaluations': algorithm.evaluations,
+        'generations': max(states - 1, 1)
+    }
+
+def _case_key(case):
+    return (case['algorithm'], case['population_size'], case['dimensions'],
+            case['generations'])
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+                prog='python -m evo.benchmarks',
+                description='Measures the throughput of the algorithms and '
+                            'compares it with a baseline.')
+
+    commands = parser.add_subparsers(dest='command')
+
+    run = commands.add_parser('run', help='runs the suite and saves the results')
+    run.add_argument('-o', '--output', default='baseline.json')
+    run.add_argument('-a', '--algorithms', nargs='+', default=DEFAULT_ALGORITHMS,
+                     choices=sorted(ALGORITHMS))
+    run.add_argument('-n', '--sizes', nargs='+', type=int, default=[50, 500])
+    run.add_argument('-d', '--dimensions', nargs='+', type=int, default=[2, 30])
+    run.add_argument('-g', '--generations', type=int, default=50)
+    run.add_argument('-r', '--repeats', type=int, default=3)
+
+    check = commands.add_parser(
+                'compare',
+                help='compares results with a baseline; exits with status 1 if '
+                     'any measure regressed')
+    check.add_argument('baseline')
+    check.add_argument('current', nargs='?',
+                       help='results to compare; by default the suite is run '
+                            'again with the settings of the baseline')
+    check.add_argument('-t', '--threshold', type=float, default=0.1,
+                       help='relative change taken as a regression (default 0.1)')
+
+    args = parser.parse_args(args)
+
+    if args.command == 'run':
+        results = run_suite(args.algorithms, args.sizes, args.dimensions,
+                            args.generations, args.repeats)
+
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+        for case in results['cases']:
+            print _format_case(case), ' '.join(
+                        '%s=%.4g' % (measure, case[measure])
+                        for measure in sorted(MEASURES))
+
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        cases = baseline['cases']
+
+        current = run_suite(
+                    sorted(set(case['algorithm'] for case in cases)),
+                    sorted(set(case['population_size'] for case in cases)),
+                    sorted(set(case['dimensions'] for case in cases)),
+                    cases[0]['generations'] if cases else 50,
+                    cases[0]['repeats'] if cases else 3)
+
+    regressions = 0
+
+    for case, measure, before, after, change, regression in compare(
+                                        baseline, current, args.threshold):
+        flag = ''
+
+        if regression:
+            flag = 'REGRESSION'
+            regressions += 1
+
+        print '%-24s %-24s %12.4g %12.4g %+8.1f%% %s' % (
+                    _format_case(case), measure, before, after, 100 * change, flag)
+
+    if regressions:
+        print '%d regressions above %.0f%%' % (regressions, 100 * args.threshold)
+        sys.exit(1)
+
+def _format_case(case):
+    return '%s/n=%d/d=%d' % (case['algorithm'], case['population_size'],
+                             case['dimensions'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import os
+import time
+import cPickle as pickle
+
+from tools import atomic_replace
+
+# bumped whenever the saved state changes in a way older files can't be read
+VERSION = 1
+
+class Checkpoint(object):
+    """Saves the complete state of a run to a file every few generations or
+    seconds, so an interrupted run can go on exactly where it was left.
+
+    The state is everything the algorithm keeps between generations: the
+    population and its per-row fields, the algorithm's own arrays (velocities,
+    trial counters, pheromones...), the generation count, the termination
+    criteria, the random stream and the history. It is pickled with the binary
+    protocol, so arrays are stored as raw bytes, to a temporary file which then
+    replaces the checkpoint, so a crash while saving leaves the previous one
+    intact.
+
+    When a run is started with a checkpoint whose file exists, the run is
+    resumed from it instead, and, given the same function and arguments, goes
+    on exactly as the uninterrupted run would have. A finished run resumed this
+    way stops right away; remove the file to start over.
+
+    Arguments:
+    path -- file where the state is saved
+    generations -- saves the state every this many generations (default None)
+    seconds -- saves the state once this many seconds of wall-clock time have
+               passed since the last save (default None)
+
+    If neither generations nor seconds are given, the state is saved after
+    every generation.
+    """
+
+    def __init__(self, path, generations=None, seconds=None):
+        self.path = path
+        self.generations = generations
+        self.seconds = seconds
+
+        self.start()
+
+    def start(self, generation=0):
+        """Counts the generations and seconds until the next save from a
+        generation; called when a run starts or is resumed.
+        """
+
+        self._last_generation = generation
+        self._last_time = time.time()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def due(self, generation):
+        """Tells if the state must be saved at a generation."""
+
+        if self.generations is None and self.seconds is None:
+            return True
+
+        if (self.generations is not None
+                and generation - self._last_generation >= self.generations):
+            return True
+
+        return (self.seconds is not None
+                and time.time() - self._last_time >= self.seconds)
+
+    def save(self, generation, state):
+        """Writes the state of an algorithm at a generation to the file."""
+
+        saved = {'version': VERSION, 'state': state}
+
+        atomic_replace(
+            self.path,
+            lambda f: pickle.dump(saved, f, pickle.HIGHEST_PROTOCOL),
+            'wb')
+
+        self._last_generation = generation
+        self._last_time = time.time()
+
+    def load(self):
+        """Returns the state saved in the file, or None if there is none."""
+
+        if not self.exists():
+            return None
+
+        with open(self.path, 'rb') as f:
+            saved = pickle.load(f)
+
+        if saved.get('version') != VERSION:
+            raise ValueError('unsupported checkpoint version: %r'
+                             % saved.get('version'))
+
+        return saved['state']
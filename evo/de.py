@@ -1,44 +1,228 @@
-import copy
-import random
 import numpy as np
 from evo import EvolutionaryAlgorithm as EA
 
 class DifferentialEvolution(EA):
+    """Differential Evolution.
+
+    Mutants, crossover masks and trials are computed for the whole population at
+    once.
+
+    Arguments:
+    strategy -- how mutants are built: 'rand/1', 'best/1', 'current-to-best/1'
+                or 'rand/2' (default 'rand/1')
+    crossover -- 'binomial' or 'exponential' (default 'binomial')
+    adaptation -- None to use the given stepsize and crossover_rate for every
+                  individual; 'jde' to let each individual evolve its own, or
+                  'shade' to sample them from a memory of the values that
+                  produced better trials. In both cases the given values are
+                  the initial ones (default None)
+    memory_size -- number of entries of the 'shade' memory (default 10)
+    """
+
+    # number of random individuals required by each strategy
+    STRATEGIES = {
+        'rand/1': 3,
+        'best/1': 2,
+        'current-to-best/1': 2,
+        'rand/2': 5
+    }
+
+    _PHASES = EA._PHASES + ('_control_parameters', '_mutants',
+                            '_crossover_mask', '_adapt')
+
     def __init__(
             self,
             population_size=40,
             crossover_rate=0.1,
-            stepsize=0.5):
+            stepsize=0.5,
+            strategy='rand/1',
+            crossover='binomial',
+            adaptation=None,
+            memory_size=10):
+
+        if strategy not in self.STRATEGIES:
+            raise ValueError('unknown strategy: %r' % strategy)
+
+        if crossover not in ('binomial', 'exponential'):
+            raise ValueError('unknown crossover: %r' % crossover)
+
+        if adaptation not in (None, 'jde', 'shade'):
+            raise ValueError('unknown adaptation: %r' % adaptation)
 
         EA.__init__(self, population_size, 0, 0)
 
         self.crossover_rate = crossover_rate
         self.stepsize = stepsize
+        self.strategy = strategy
+        self.crossover = crossover
+        self.adaptation = adaptation
+        self.memory_size = memory_size
+
+    def _init_population(self):
+        EA._init_population(self)
+
+        if self.adaptation == 'jde':
+            self._population.add_field('stepsizes', fill=self.stepsize)
+            self._population.add_field('crossover_rates', fill=self.crossover_rate)
+        elif self.adaptation == 'shade':
+            self._memory_stepsizes = np.full(self.memory_size, self.stepsize)
+            self._memory_crossover_rates = np.full(self.memory_size,
+                                                   self.crossover_rate)
+            self._memory_index = 0
 
     def _evolve(self):
-        children = []
+        population = self._population
+
+        stepsizes, crossover_rates = self._control_parameters()
+
+        mutants = self._mutants(stepsizes[:, np.newaxis])
+
+        trials = np.where(
+                    self._crossover_mask(crossover_rates),
+                    mutants,
+                    population.vectors).astype(population.dtype)
+
+        # evaluate all the trials at once; the parents values are cached from
+        # previous generations
+        trial_values = self._evaluate_vectors(trials)
+        parent_values = self._evaluate_population()
+
+        improved = self._cost(trial_values) < self._cost(parent_values)
+
+        self._adapt(improved, stepsizes, crossover_rates, trial_values, parent_values)
+
+        population.set_vectors(improved, trials[improved], trial_values[improved])
+
+    def _mutants(self, stepsizes):
+        vectors = self._population.vectors
+
+        r = self._donors(self.STRATEGIES[self.strategy])
+
+        # the population is sorted, so the first individual is the best
+        if self.strategy == 'rand/1':
+            return vectors[r[0]] + stepsizes * (vectors[r[1]] - vectors[r[2]])
+        elif self.strategy == 'best/1':
+            return vectors[0] + stepsizes * (vectors[r[0]] - vectors[r[1]])
+        elif self.strategy == 'current-to-best/1':
+            return (vectors
+                    + stepsizes * (vectors[0] - vectors)
+                    + stepsizes * (vectors[r[0]] - vectors[r[1]]))
+        else:
+            return (vectors[r[0]]
+                    + stepsizes * (vectors[r[1]] - vectors[r[2]])
+                    + stepsizes * (vectors[r[3]] - vectors[r[4]]))
+
+    def _donors(self, count):
+        """Draws count indices for each individual, all distinct and different
+        from the individual's own index.
+        """
+
+        size = len(self._population)
+
+        if size <= count:
+            raise ValueError('the %s strategy requires a population of at '
+                             'least %d individuals' % (self.strategy, count + 1))
+
+        chosen = [np.arange(size)]
+
+        for k in range(count):
+            r = self.random.randint(size, size=size)
+
+            # draw again only the indices that clash with the chosen ones
+            while True:
+                clash = np.zeros(size, dtype=bool)
+
+                for c in chosen:
+                    clash |= r == c
+
+                if not clash.any():
+                    break
+
+                r[clash] = self.random.randint(size, size=clash.sum())
+
+            chosen.append(r)
+
+        return chosen[1:]
+
+    def _crossover_mask(self, crossover_rates):
+        """Tells which parameters of each trial are taken from the mutant."""
+
+        size, dimensions = self._population.vectors.shape
+
+        crossover_rates = crossover_rates[:, np.newaxis]
+        start = self.random.randint(dimensions, size=size)
+
+        if self.crossover == 'binomial':
+            mask = self.random.random_sample((size, dimensions)) <= crossover_rates
+
+            # at least one parameter comes from the mutant
+            mask[np.arange(size), start] = True
+        else:
+            # a run of parameters, from start and wrapping around, as long as
+            # consecutive draws are below the crossover rate
+            successes = self.random.random_sample((size, dimensions - 1)) < crossover_rates
+            length = 1 + np.cumprod(successes, axis=1).sum(axis=1)
+
+            offsets = (np.arange(dimensions) - start[:, np.newaxis]) % dimensions
+            mask = offsets < length[:, np.newaxis]
+
+        return mask
+
+    def _control_parameters(self):
+        """Returns the stepsize and crossover rate for each individual."""
+
+        size = len(self._population)
+
+        if self.adaptation == 'jde':
+            stepsizes = np.array(self._population.stepsizes)
+            crossover_rates = np.array(self._population.crossover_rates)
+
+            renewed = self.random.random_sample(size) < 0.1
+            stepsizes[renewed] = self.random.uniform(0.1, 1, renewed.sum())
+
+            renewed = self.random.random_sample(size) < 0.1
+            crossover_rates[renewed] = self.random.random_sample(renewed.sum())
+        elif self.adaptation == 'shade':
+            r = self.random.randint(self.memory_size, size=size)
+
+            crossover_rates = np.clip(
+                    self.random.normal(self._memory_crossover_rates[r], 0.1), 0, 1)
+
+            stepsizes = np.zeros(size)
+            pending = np.ones(size, dtype=bool)
+
+            # cauchy samples which are not positive are drawn again
+            while pending.any():
+                stepsizes[pending] = (self._memory_stepsizes[r[pending]]
+                                      + 0.1 * self.random.standard_cauchy(pending.sum()))
+
+                pending = stepsizes <= 0
 
-        for i, individual in enumerate(self._population):
-            population = copy.copy(self._population)
-            del population[i] # make sure current individual is not selected
+            stepsizes = np.minimum(stepsizes, 1)
+        else:
+            stepsizes = np.full(size, self.stepsize)
+            crossover_rates = np.full(size, self.crossover_rate)
 
-            r1, r2, r3 = random.sample(population, 3)
+        return stepsizes, crossover_rates
 
-            mutant = r1 + self.stepsize * (r2 - r3)
+    def _adapt(self, improved, stepsizes, crossover_rates, trial_values, parent_values):
+        if self.adaptation == 'jde':
+            # the parameters survive along with the trials they produced
+            self._population.stepsizes[improved] = stepsizes[improved]
+            self._population.crossover_rates[improved] = crossover_rates[improved]
+        elif self.adaptation == 'shade' and improved.any():
+            # the successful parameters are weighted by the improvement achieved
+            weights = np.abs(self._objective(parent_values[improved])
+                             - self._objective(trial_values[improved]))
+            weights /= weights.sum()
 
-            # crossover
-            trial = np.zeros(self._dimensions)
-            rj = random.randrange(self._dimensions)
+            stepsizes = stepsizes[improved]
 
-            for j in range(self._dimensions):
-                if random.random() <= self.crossover_rate or j == rj:
-                    trial[j] = mutant[j]
-                else:
-                    trial[j] = individual[j]
+            k = self._memory_index
 
-            if self._cost(trial) < self._cost(individual):
-                children.append(trial)
-            else:
-                children.append(individual)
+            self._memory_stepsizes[k] = (np.sum(weights * stepsizes**2)
+                                         / np.sum(weights * stepsizes))
+            self._memory_crossover_rates[k] = np.sum(weights
+                                                     * crossover_rates[improved])
 
-        self._population = children
+            self._memory_index = (k + 1) % self.memory_size
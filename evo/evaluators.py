@@ -0,0 +1,254 @@
+import time
+import threading
+import Queue
+import multiprocessing
+import multiprocessing.sharedctypes
+import numpy as np
+from collections import deque
+
+class EvaluationTimeout(Exception):
+    pass
+
+class SerialEvaluator:
+    """Evaluates the solutions one after the other in the current process.
+
+    Evaluators are opened with the objective function before a run and closed
+    after it; in between, evaluate takes a (N, D) matrix with a solution per row
+    and returns the N objective values. The function takes the whole matrix if
+    vectorized, each solution as a single vector if vector_argument, and
+    otherwise each solution as one argument per parameter.
+    """
+
+    def open(self, function, vectorized, vector_argument=False):
+        self._function = function
+        self._vectorized = vectorized
+        self._vector_argument = vector_argument
+
+    def evaluate(self, vectors):
+        return _call(self._function, self._vectorized, self._vector_argument,
+                     vectors)
+
+    def close(self):
+        pass
+
+class ProcessPoolEvaluator:
+    """Evaluates the solutions in a pool of worker processes.
+
+    The solutions are written to a shared memory buffer which the workers read
+    directly, so only the row ranges of each chunk and the resulting values are
+    sent between processes. The objective function is handed to the workers
+    when the pool starts, so it does not need to be picklable on platforms that
+    fork.
+
+    Arguments:
+    processes -- number of worker processes (default number of CPUs)
+    chunksize -- number of solutions sent to a worker at once; by default the
+                 solutions are split in about four chunks per worker
+    """
+
+    def __init__(self, processes=None, chunksize=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunksize = chunksize
+
+        self._pool = None
+
+    def open(self, function, vectorized, vector_argument=False):
+        self.close()
+
+        self._function = function
+        self._vectorized = vectorized
+        self._vector_argument = vector_argument
+
+        self._capacity = 0
+
+    def evaluate(self, vectors):
+        vectors = np.asarray(vectors, dtype=float)
+        count, dimensions = vectors.shape
+
+        if not count:
+            return np.zeros(0)
+
+        # the workers get the buffer when they start, so a bigger one requires
+        # restarting the pool
+        if vectors.size > self._capacity:
+            self._start(max(vectors.size, 2 * self._capacity))
+
+        self._buffer[:vectors.size] = vectors.ravel()
+
+        chunksize = self.chunksize or -(-count // (4 * self.processes))
+
+        chunks = [(start, min(start + chunksize, count), dimensions)
+                  for start in range(0, count, chunksize)]
+
+        return np.concatenate(self._pool.map(_evaluate_chunk, chunks))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+            self._pool = None
+
+    def _start(self, capacity):
+        self.close()
+
+        shared = multiprocessing.sharedctypes.RawArray('d', capacity)
+
+        self._buffer = np.frombuffer(shared)
+        self._capacity = capacity
+
+        self._pool = multiprocessing.Pool(
+                            self.processes,
+                            _init_worker,
+                            (self._function, self._vectorized,
+                             self._vector_argument, shared))
+
+class ThreadedEvaluator:
+    """Evaluates the solutions concurrently, each in its own thread.
+
+    Intended for I/O bound objectives, e.g. ones that run an external solver or
+    query a server, which spend most of the evaluation time waiting.
+
+    Python threads can not be cancelled, so an evaluation that times out is
+    abandoned: it keeps running in the background but its result is ignored.
+
+    Arguments:
+    concurrency -- maximum number of evaluations running at once (default 8)
+    timeout -- seconds an evaluation may take; None waits forever (default None)
+    retries -- number of times a failed or timed out evaluation is started
+               again (default 0)
+    penalty -- objective value given to the evaluations that still fail after
+               the retries. If None, the error is raised instead (default None)
+    """
+
+    def __init__(self, concurrency=8, timeout=None, retries=0, penalty=None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.penalty = penalty
+
+    def open(self, function, vectorized, vector_argument=False):
+        self._function = function
+        self._vectorized = vectorized
+        self._vector_argument = vector_argument
+
+    def evaluate(self, vectors):
+        count = len(vectors)
+
+        values = np.zeros(count)
+        attempts = [0] * count
+
+        results = Queue.Queue()
+        waiting = deque(range(count))
+
+        # maps the index of each running evaluation to its attempt number and
+        # deadline; results of abandoned attempts are discarded
+        running = {}
+
+        while waiting or running:
+            while waiting and len(running) < self.concurrency:
+                i = waiting.popleft()
+
+                self._start(results, i, attempts[i], vectors[i:i + 1])
+
+                if self.timeout is None:
+                    running[i] = attempts[i], None
+                else:
+                    running[i] = attempts[i], time.time() + self.timeout
+
+            try:
+                i, attempt, error, value = results.get(
+                                                timeout=self._wait_time(running))
+            except Queue.Empty:
+                now = time.time()
+
+                for i, (attempt, deadline) in running.items():
+                    if deadline is not None and deadline <= now:
+                        del running[i]
+
+                        error = EvaluationTimeout(
+                                    'evaluation took more than %s seconds'
+                                    % self.timeout)
+
+                        self._fail(i, error, values, attempts, waiting)
+
+                continue
+
+            if i not in running or running[i][0] != attempt:
+                continue
+
+            del running[i]
+
+            if error is None:
+                values[i] = value
+            else:
+                self._fail(i, error, values, attempts, waiting)
+
+        return values
+
+    def close(self):
+        pass
+
+    def _start(self, results, i, attempt, vectors):
+        thread = threading.Thread(
+                        target=self._run,
+                        args=(results, i, attempt, vectors))
+
+        # abandoned evaluations must not keep the interpreter from exiting
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, results, i, attempt, vectors):
+        try:
+            value = _call(self._function, self._vectorized,
+                          self._vector_argument, vectors)[0]
+        except Exception as error:
+            results.put((i, attempt, error, None))
+        else:
+            results.put((i, attempt, None, value))
+
+    def _fail(self, i, error, values, attempts, waiting):
+        if attempts[i] < self.retries:
+            attempts[i] += 1
+            waiting.append(i)
+        elif self.penalty is not None:
+            values[i] = self.penalty
+        else:
+            raise error
+
+    def _wait_time(self, running):
+        deadlines = [deadline for attempt, deadline in running.values()
+                     if deadline is not None]
+
+        if deadlines:
+            return max(0, min(deadlines) - time.time())
+
+def _call(function, vectorized, vector_argument, vectors):
+    if vectorized:
+        values = function(np.asarray(vectors, dtype=float))
+    elif vector_argument:
+        values = [function(vector) for vector in vectors]
+    else:
+        values = [function(*vector) for vector in vectors]
+
+    return np.asarray(values, dtype=float)
+
+# state of the worker processes of a ProcessPoolEvaluator
+_worker = {}
+
+def _init_worker(function, vectorized, vector_argument, shared):
+    _worker['function'] = function
+    _worker['vectorized'] = vectorized
+    _worker['vector_argument'] = vector_argument
+    _worker['buffer'] = np.frombuffer(shared)
+
+def _evaluate_chunk(chunk):
+    start, stop, dimensions = chunk
+
+    vectors = _worker['buffer'][start * dimensions:stop * dimensions]
+
+    return _call(
+            _worker['function'],
+            _worker['vectorized'],
+            _worker['vector_argument'],
+            vectors.reshape(-1, dimensions))
@@ -1,22 +1,24 @@
 import abc
-import random
-import copy
 import numpy as np
 from collections import namedtuple
-from tools import Interval
+from tools import Interval, create_random, seed_words
+from population import Population
+from evaluators import SerialEvaluator
+from history import Generation, create_history
+from termination import create_termination
 
-Generation = namedtuple('Generation', ['population', 'best'])
+# a summary of the algorithm state after a generation; best is the best solution
+# of the generation and value its objective value
+State = namedtuple('State', ['generation', 'best', 'value', 'evaluations'])
 
-class Individual:
-    def __init__(self, vector):
-        self.vector = vector
-
-# TODO: implement a _normalize abstract method and use it in evaluate, _get_generation
-# and _best, so subclases dont have to override these methods, but only implement
-# a the _normalize one.
 class EvolutionaryAlgorithm:
     __metaclass__ = abc.ABCMeta
 
+    # the methods timed by a profiling.Profiler; subclasses add their own
+    _PHASES = ('_evolve', '_sort_population', '_evaluate_vectors',
+               '_get_generation', '_record_generation', '_check_termination',
+               '_save_checkpoint')
+
     def __init__(
             self,
             population_size,
@@ -30,6 +32,31 @@ class EvolutionaryAlgorithm:
 
         self._population = []
 
+        # every random draw of the algorithm comes from its own stream, so runs
+        # can be repeated with seed
+        self.random = create_random()
+
+        self._profiler = None
+
+    def seed(self, seed=None):
+        """Seeds the random stream of the algorithm with an int or a sequence
+        of ints, e.g. one from tools.spawn_seeds; None seeds it from the OS
+        entropy.
+        """
+
+        self.random.seed(seed_words(seed))
+
+    def profile(self, profiler=None):
+        """Times the phases of the algorithm with a profiling.Profiler, which
+        reports each generation to its observers; None stops profiling.
+        """
+
+        if self._profiler is not None:
+            self._profiler.detach()
+
+        if profiler is not None:
+            profiler.attach(self)
+
     def optimize(
             self,
             function,
@@ -37,7 +64,14 @@ class EvolutionaryAlgorithm:
             lower_bounds=[],
             upper_bounds=[],
             problem_type='min',
-            max_generations=100):
+            max_generations=100,
+            vectorized=False,
+            dtype=np.float64,
+            evaluator=None,
+            history='full',
+            termination=None,
+            dimensions=None,
+            checkpoint=None):
         """Optimize a function using evolutionary techniques.
 
         Arguments:
@@ -46,123 +80,364 @@ class EvolutionaryAlgorithm:
         upper_bounds -- upper bounds for each solution parameter
         problem_type -- one of 'max' or 'min' strings. Tells if maximize or
                         minimize the objective function (default 'min')
-        max_generations -- number of generations to evolve the solution (default 100)
+        max_generations -- number of generations to evolve the solution; None
+                           runs until the termination criteria are met
+                           (default 100)
+        vectorized -- if True, function takes a (N, D) matrix with one candidate
+                      per row and returns its N objective values at once. The
+                      number of dimensions is taken from the bounds (default False)
+        dtype -- floating point type used to store the population; np.float32
+                 halves the memory of large populations (default np.float64)
+        evaluator -- how the solutions are evaluated, e.g. a ProcessPoolEvaluator
+                     to evaluate them in parallel or a ThreadedEvaluator for I/O
+                     bound functions (default a SerialEvaluator)
+        history -- which generations are kept in the generations attribute:
+                   'full', 'none', 'best-only', 'every-K', 'last-K' or a
+                   History (default 'full')
+        termination -- a Criterion, or a list of them, to stop before
+                       max_generations; e.g. Stall(20) | TimeLimit(60). The
+                       reason to stop is set in the stop_reason attribute
+                       (default None)
+        dimensions -- number of solution parameters. If given, function takes
+                      a solution as a single vector instead of one argument per
+                      parameter, e.g. the functions of evo.functions; otherwise
+                      it is taken from the function arguments, or the bounds if
+                      vectorized (default None)
+        checkpoint -- a Checkpoint to save the state of the run to, every few
+                      generations or seconds; if its file exists, the run is
+                      resumed from it, history included (default None)
+        """
+
+        # stores the results of each generation; this data is intented for
+        # analysis. A resumed run gets it back from the checkpoint
+        if checkpoint is None or not checkpoint.exists():
+            self.generations = create_history(history)
+
+            if max_generations is not None:
+                self.generations.reserve(max_generations + 1)
+
+        states = self.optimize_iter(
+                        function,
+                        domain,
+                        lower_bounds,
+                        upper_bounds,
+                        problem_type,
+                        max_generations,
+                        vectorized,
+                        dtype,
+                        evaluator,
+                        termination,
+                        dimensions,
+                        checkpoint)
+
+        try:
+            for state in states:
+                self._record_generation(state.generation)
+        finally:
+            self.generations.close()
+
+        return self._best()
+
+    def optimize_iter(
+            self,
+            function,
+            domain=(-100, 100),
+            lower_bounds=[],
+            upper_bounds=[],
+            problem_type='min',
+            max_generations=None,
+            vectorized=False,
+            dtype=np.float64,
+            evaluator=None,
+            termination=None,
+            dimensions=None,
+            checkpoint=None):
+        """Optimize a function step by step; yields a State after each generation.
+
+        Takes the same arguments as optimize, except history, which is not
+        recorded. If max_generations is None, the generations go on until the
+        caller stops iterating. Between steps the algorithm can be inspected or
+        reconfigured; once done, the best solution is given by the last State.
+        The checkpoint is saved right after a generation is evolved.
         """
 
         # domain is used for backwards compatibility. Algoriths must use
         # lower_bounds and upper_bounds instead
         self._domain = Interval(*domain)
 
-        self._set_problem(function, lower_bounds, upper_bounds, problem_type)
-        self._init_algorithm()
+        self._set_problem(
+                function,
+                lower_bounds,
+                upper_bounds,
+                problem_type,
+                vectorized,
+                evaluator,
+                dimensions)
+
+        self._dtype = dtype
+
+        self._set_termination(termination)
+
+        try:
+            if checkpoint is not None and checkpoint.exists():
+                self._restore(checkpoint.load())
+            else:
+                self._init_algorithm()
+
+                self._generation = 0
+
+            if checkpoint is not None:
+                checkpoint.start(self._generation)
+
+            while True:
+                self._sort_population()
 
-        # stores the results of each generation; this data is intented for analysis
-        self.generations = []
+                state = self._get_state(self._generation)
 
-        count = 0
+                if (max_generations is not None
+                        and self._generation >= max_generations):
+                    self.stop_reason = 'max_generations'
+                else:
+                    self._check_termination(state)
 
-        while True:
-            self._sort_population()
-            self.generations.append(self._get_generation())
+                yield state
+
+                if self.stop_reason:
+                    break
 
-            if count < max_generations:
                 self._evolve()
-                count += 1
-            else:
-                break
+                self._generation += 1
 
-        return self._best()
+                self._save_checkpoint(checkpoint, self._generation)
+        finally:
+            self._evaluator.close()
 
     def _init_algorithm(self):
         self._init_population()
 
+    # attributes set again from the arguments of each run, which may not be
+    # picklable; the rest of them are the state saved in checkpoints
+    _TRANSIENT = ('_function', '_evaluator', '_profiler')
+
+    def _save_checkpoint(self, checkpoint, generation):
+        if checkpoint is not None and checkpoint.due(generation):
+            checkpoint.save(generation, self._checkpoint_state())
+
+    def _checkpoint_state(self):
+        """Returns the state of the run, as a dict of attributes.
+
+        Subclasses keeping state outside their attributes, e.g. in local
+        variables of a generator, must move it to attributes.
+        """
+
+        transient = self._TRANSIENT
+
+        if self._profiler is not None:
+            # the timing wrappers of the profiled methods
+            transient += self._profiler.phases
+
+        return dict((name, value) for name, value in self.__dict__.items()
+                    if name not in transient)
+
+    def _restore(self, state):
+        """Sets the state of a run saved by _checkpoint_state."""
+
+        self.__dict__.update(state)
+
     def _init_population(self):
-        self._population = [self._rand_individual()
-                            for i in range(self._population_size)]
+        self._population = Population(
+                                self._rand_vectors(self._population_size),
+                                self._dtype)
 
     @abc.abstractmethod
     def _evolve(self):
         return
 
+    def _record_generation(self, index):
+        if self.generations.accepts(index):
+            self.generations.record(index, self._get_generation())
+
+    def diversity(self):
+        """Returns the standard deviation of the current solutions, averaged
+        over the dimensions.
+        """
+
+        solutions = self._normalize(self._population.vectors)
+
+        return np.mean(np.std(solutions, axis=0))
+
+    def _set_termination(self, termination):
+        self._termination = create_termination(termination)
+        self._termination.start(self)
+
+        # the reason why the run stopped, once it does
+        self.stop_reason = None
+
+    def _check_termination(self, state):
+        self.stop_reason = self._termination.check(state, self)
+
+        return self.stop_reason
+
+    def _get_state(self, generation):
+        return State(
+                generation,
+                self._best(),
+                self._population.values[0],
+                self.evaluations)
+
     def _get_generation(self):
-        population = copy.deepcopy(self._population)
+        # the history copies the generation, so no copy is made here
+        population = self._normalize(self._population.vectors)
 
         best = population[0]
 
-        return Generation(population, (best, self._function(*best)))
-
-    def _rand_individual(self):
-        params = np.zeros(self._dimensions)
+        return Generation(
+                    population,
+                    (best, self._population.values[0]),
+                    self._population.values)
 
-        for i in range(self._dimensions):
-            params[i] = random.uniform(
-                            self._lower_bounds[i],
-                            self._upper_bounds[i])
+    def _rand_vectors(self, count):
+        """Returns count random vectors within the bounds, one per row."""
 
-        return params
+        return self.random.uniform(
+                    self._lower_bounds,
+                    self._upper_bounds,
+                    (count, self._dimensions))
 
     def _sort_population(self):
-        is_maximize = self._problem_type == 'max'
+        values = self._evaluate_population()
 
-        self._population.sort(key=self._evaluate, reverse=is_maximize)
+        # the objective is always minimized, so the best individuals are the ones
+        # with the lowest values; mergesort keeps the sort stable.
+        self._population.reorder(
+                np.argsort(self._objective(values), kind='mergesort'))
 
     def _best(self):
         # as the population is sorted before each generation, we expect the first
         # individual to be the best
-        return self._population[0]
+        return np.array(self._normalize(self._population.vectors[:1])[0])
+
+    def _normalize(self, vectors):
+        """Returns the solutions represented by some population vectors.
+
+        Subclasses whose vectors do not hold the solution itself, e.g. an
+        encoded one, must override this method, so evaluation, _best and
+        _get_generation work on them.
+        """
+
+        return vectors
+
+    def _evaluate_population(self, population=None):
+        """Returns the values of a population, evaluating only the rows
+        without a cached value (by default, the current population).
+        """
+
+        if population is None:
+            population = self._population
+
+        pending = np.isnan(population.values)
 
-    def _evaluate(self, individual):
-        return self._function(*individual)
+        if pending.any():
+            population.values[pending] = self._evaluate_vectors(
+                                self._normalize(population.vectors[pending]))
+
+        return population.values
+
+    def _evaluate_vectors(self, vectors):
+        """Calls the objective function on each solution; never cached."""
+
+        if not len(vectors):
+            return np.zeros(0)
+
+        self.evaluations += len(vectors)
+
+        return self._evaluator.evaluate(vectors)
+
+    def _replace(self, rows, vectors, values):
+        """Replaces the solutions of some rows by others whose values are
+        known, e.g. migrants from another population, and sorts the population
+        again. Subclasses with other per-row fields must reset them too.
+        """
+
+        self._population.set_vectors(rows, vectors, values)
+
+        self._sort_population()
 
     def _pick_elites(self):
-        # asumes the population is sorted by best; get the first (so best) _num_elites
-        # individuals
-        elites = self._population[:self._num_elites]
+        # asumes the population is sorted by best; get a copy of the first (so
+        # best) _num_elites individuals
+        return self._population.take(slice(self._num_elites))
 
-        self._population = self._population[self._num_elites:]
+    def _set_problem(
+            self,
+            function,
+            lower_bounds,
+            upper_bounds,
+            problem_type,
+            vectorized=False,
+            evaluator=None,
+            dimensions=None):
 
-        return elites
+        # given the dimensions, a function which is not vectorized takes each
+        # solution as a single vector
+        vector_argument = dimensions is not None and not vectorized
 
-    def _set_problem(self, function, lower_bounds, upper_bounds, problem_type):
         self._function = function
         self._problem_type = problem_type
+        self._vectorized = vectorized
+
+        self._evaluator = evaluator or SerialEvaluator()
+        self._evaluator.open(function, vectorized, vector_argument)
+
+        # number of times the objective function has been called on a solution
+        self.evaluations = 0
+
+        # calculate dimensions; a vectorized function takes a single matrix
+        # argument, so its dimensions must be inferred from the bounds
+        if dimensions is not None:
+            self._dimensions = dimensions
+
+            for bounds in (lower_bounds, upper_bounds):
+                if bounds and len(bounds) != dimensions:
+                    raise ValueError('expected %d bounds, got %d'
+                                     % (dimensions, len(bounds)))
+        elif vectorized:
+            self._dimensions = len(lower_bounds) or len(upper_bounds)
 
-        # calculate dimensions
-        self._dimensions = function.func_code.co_argcount
+            if not self._dimensions:
+                raise ValueError('vectorized functions require lower_bounds '
+                                 'or upper_bounds')
+        else:
+            self._dimensions = function.func_code.co_argcount
 
         # set boundaries
         self._lower_bounds = self._new_bounds(lower_bounds, -1000)
         self._upper_bounds = self._new_bounds(upper_bounds, 1000)
 
-        self._set_objective_function()
-
     def _new_bounds(self, bounds, value):
         if bounds:
             return np.array(bounds)
         else:
             return np.zeros(self._dimensions) + value
 
-    def _fitness(self, individual):
-        val = self._objective(individual)
+    # the following methods take objective function values, either a single one
+    # or an array of them
 
-        if val >= 0:
-            return 10000 / (1 + val)
-        else:
-            return 10000 + abs(val)
+    def _fitness(self, values):
+        val = self._objective(values)
 
-    def _cost(self, individual):
-        val = self._objective(individual)
+        return np.where(val >= 0, 10000 / (1 + np.abs(val)), 10000 + np.abs(val))
 
-        if val >= 0:
-            return 10000 + val
-        else:
-            return 10000 / (1 + abs(val))
+    def _cost(self, values):
+        val = self._objective(values)
+
+        return np.where(val >= 0, 10000 + val, 10000 / (1 + np.abs(val)))
 
-    def _set_objective_function(self):
+    def _objective(self, values):
         # the fitness and cost methods defined above are designed to minimize a
         # function. If the problem is a maximization problem, it must be converted
         # into a minimization problem. This is done by simply minimizing -f(x)
-        if self._problem_type is 'max':
-            self._objective = lambda individual: self._evaluate(individual) * -1
+        if self._problem_type == 'max':
+            return np.negative(values)
         else:
-            self._objective = self._evaluate
+            return np.asarray(values)
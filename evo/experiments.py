@@ -0,0 +1,295 @@
+import os
+import sys
+import csv
+import json
+import time
+import inspect
+import argparse
+import multiprocessing
+import numpy as np
+
+import functions
+from genetics import BasicBinaryGA, RealCodedGA
+from de import DifferentialEvolution
+from particles import ParticleSwarm
+from bees import ArtificialBeeColony
+from bacterium import BacterialForaging
+from ants import ContinuousACO, ArchiveACO
+
+# the algorithms and functions an experiment can refer to by name
+
+ALGORITHMS = {
+    'ga': BasicBinaryGA,
+    'rcga': RealCodedGA,
+    'de': DifferentialEvolution,
+    'pso': ParticleSwarm,
+    'abc': ArtificialBeeColony,
+    'bfoa': BacterialForaging,
+    'aco': ContinuousACO,
+    'acor': ArchiveACO
+}
+
+FUNCTIONS = functions.FUNCTIONS
+
+class Experiment:
+    """Runs every algorithm on every function, with every number of
+    dimensions and every seed, in a pool of processes.
+
+    Each run, a cell of the grid, is appended to runs.jsonl in the output
+    directory as soon as it is done, and runs already there are skipped, so
+    an interrupted experiment goes on where it was left when run again. The
+    final values of the runs of each algorithm, function and dimensions are
+    then summarized in summary.json and summary.csv.
+
+    Arguments:
+    algorithms -- names of the algorithms, keys of ALGORITHMS
+    functions -- names of the functions, keys of FUNCTIONS; each is searched
+                 within its usual bounds
+    dimensions -- numbers of dimensions of the problems (default [2])
+    seeds -- random seeds; each one is a run of every combination
+             (default [0])
+    max_generations -- number of generations of each run (default 100)
+    options -- maps algorithm names to the keyword arguments used to create
+               them (default None)
+    processes -- number of worker processes (default number of CPUs)
+    """
+
+    def __init__(
+            self,
+            algorithms,
+            functions,
+            dimensions=[2],
+            seeds=[0],
+            max_generations=100,
+            options=None,
+            processes=None):
+
+        for name in algorithms:
+            if name not in ALGORITHMS:
+                raise ValueError('unknown algorithm: %r' % name)
+
+        for name in functions:
+            if name not in FUNCTIONS:
+                raise ValueError('unknown function: %r' % name)
+
+        self.algorithms = list(algorithms)
+        self.functions = list(functions)
+        self.dimensions = list(dimensions)
+        self.seeds = list(seeds)
+        self.max_generations = max_generations
+        self.options = options or {}
+        self.processes = processes or multiprocessing.cpu_count()
+
+    def run(self, path):
+        """Runs the cells not in the output directory yet; returns the
+        summary of all the cells.
+        """
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        filename = os.path.join(path, 'runs.jsonl')
+
+        runs = _read_runs(filename)
+        done = set(_cell_key(run) for run in runs)
+
+        cells = [cell for cell in self.cells() if _cell_key(cell) not in done]
+
+        if cells:
+            pool = multiprocessing.Pool(min(self.processes, len(cells)))
+
+            try:
+                with open(filename, 'a') as f:
+                    for run in pool.imap_unordered(_run_cell, cells):
+                        f.write(json.dumps(run) + '\n')
+                        f.flush()
+
+                        runs.append(run)
+            finally:
+                pool.terminate()
+                pool.join()
+
+        keys = set(_cell_key(cell) for cell in self.cells())
+        summary = summarize([run for run in runs if _cell_key(run) in keys])
+
+        _write_summary(path, summary)
+
+        return summary
+
+    def cells(self):
+        """Returns the cells of the grid, as dicts describing each run."""
+
+        return [{'algorithm': algorithm,
+                 'function': function,
+                 'dimensions': dimensions,
+                 'seed': seed,
+                 'max_generations': self.max_generations,
+                 'options': self.options.get(algorithm, {})}
+                for algorithm in self.algorithms
+                for function in self.functions
+                for dimensions in self.dimensions
+                for seed in self.seeds]
+
+def summarize(runs):
+    """Aggregates the runs of each algorithm, function and dimensions."""
+
+    groups = {}
+
+    for run in runs:
+        key = (run['algorithm'], run['function'], run['dimensions'])
+
+        groups.setdefault(key, []).append(run)
+
+    summary = []
+
+    for (algorithm, function, dimensions), group in sorted(groups.items()):
+        values = np.array([run['value'] for run in group])
+
+        summary.append({
+            'algorithm': algorithm,
+            'function': function,
+            'dimensions': dimensions,
+            'runs': len(group),
+            'best': float(values.min()),
+            'mean': float(values.mean()),
+            'median': float(np.median(values)),
+            'std': float(values.std()),
+            'evaluations': float(np.mean([run['evaluations'] for run in group])),
+            'time': float(np.mean([run['time'] for run in group]))
+        })
+
+    return summary
+
+SUMMARY_FIELDS = ['algorithm', 'function', 'dimensions', 'runs', 'best', 'mean',
+                  'median', 'std', 'evaluations', 'time']
+
+def _write_summary(path, summary):
+    with open(os.path.join(path, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+
+    with open(os.path.join(path, 'summary.csv'), 'wb') as f:
+        writer = csv.DictWriter(f, SUMMARY_FIELDS)
+
+        writer.writeheader()
+        writer.writerows(summary)
+
+def _cell_key(cell):
+    return (cell['algorithm'], cell['function'], cell['dimensions'],
+            cell['seed'], cell['max_generations'],
+            json.dumps(cell['options'], sort_keys=True))
+
+def _read_runs(filename):
+    if not os.path.exists(filename):
+        return []
+
+    runs = []
+
+    with open(filename) as f:
+        for line in f:
+            # the last line may be incomplete if the runner was killed
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                pass
+
+    return runs
+
+def _run_cell(cell):
+    function = functions.benchmark(cell['function'], cell['dimensions'])
+
+    algorithm = ALGORITHMS[cell['algorithm']](**cell['options'])
+    algorithm.seed(cell['seed'])
+
+    arguments = {
+        'function': function,
+        'domain': (function.lower_bounds[0], function.upper_bounds[0]),
+        'lower_bounds': function.lower_bounds,
+        'upper_bounds': function.upper_bounds,
+        'vectorized': True,
+        'max_generations': cell['max_generations'],
+        'history': 'none'
+    }
+
+    # some algorithms, e.g. BacterialForaging, take their own number of steps
+    accepted = inspect.getargspec(algorithm.optimize).args
+
+    arguments = dict((name, value) for name, value in arguments.items()
+                     if name in accepted)
+
+    start = time.time()
+    best = algorithm.optimize(**arguments)
+    elapsed = time.time() - start
+
+    run = dict(cell)
+    run.update({
+        'value': float(function(best[np.newaxis])[0]),
+        'evaluations': algorithm.evaluations,
+        'time': elapsed
+    })
+
+    return run
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+                prog='python -m evo',
+                description='Runs a grid of algorithms, functions, dimensions '
+                            'and seeds, and summarizes the final values.')
+
+    parser.add_argument('-a', '--algorithms', nargs='+', required=True,
+                        choices=sorted(ALGORITHMS))
+    parser.add_argument('-f', '--functions', nargs='+', required=True,
+                        choices=sorted(FUNCTIONS))
+    parser.add_argument('-d', '--dimensions', nargs='+', type=int, default=[2])
+    parser.add_argument('-s', '--seeds', nargs='+', type=int,
+                        help='seeds of the runs (default 0)')
+    parser.add_argument('-r', '--runs', type=int,
+                        help='number of runs, with seeds 0 to RUNS - 1')
+    parser.add_argument('-g', '--generations', type=int, default=100)
+    parser.add_argument('-p', '--processes', type=int,
+                        help='number of worker processes (default number of CPUs)')
+    parser.add_argument('-o', '--output', default='results',
+                        help='directory of the results (default results)')
+    parser.add_argument('--set', action='append', default=[],
+                        metavar='ALGORITHM.OPTION=VALUE',
+                        help='sets an argument of an algorithm, e.g. '
+                             'de.strategy=best/1; may be repeated')
+
+    args = parser.parse_args(args)
+
+    if args.seeds is not None:
+        seeds = args.seeds
+    else:
+        seeds = range(args.runs or 1)
+
+    options = {}
+
+    for setting in args.set:
+        name, _, value = setting.partition('=')
+        algorithm, _, option = name.partition('.')
+
+        if not option or algorithm not in ALGORITHMS:
+            parser.error('invalid setting: %r' % setting)
+
+        # values are read as JSON when possible, e.g. numbers, and as strings
+        # otherwise
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+
+        options.setdefault(algorithm, {})[option] = value
+
+    experiment = Experiment(
+                    args.algorithms,
+                    args.functions,
+                    args.dimensions,
+                    seeds,
+                    args.generations,
+                    options,
+                    args.processes)
+
+    summary = experiment.run(args.output)
+
+    writer = csv.DictWriter(sys.stdout, SUMMARY_FIELDS)
+    writer.writeheader()
+    writer.writerows(summary)
@@ -1,10 +1,163 @@
 import math
+import numpy as np
 
-def sphere(x, y):
-    return x**2 + y**2
+# benchmark functions of any number of dimensions. Each takes either a single
+# point, a vector, and returns its value, or a (N, D) matrix with one point per
+# row and returns the N values, so they can be optimized with
+# optimize(..., dimensions=D) or optimize(..., vectorized=True). All of them
+# have a minimum value of 0.
 
-def rastrigin(x, y):
-    return 20 + x**2 - 10 * math.cos(math.pi * x) + y**2 - 10 * math.cos(2 * math.pi * y)
+def sphere(x):
+    x = np.asarray(x, dtype=float)
 
-def ackley(x, y):
-    return -20 * math.exp(-0.2 * math.sqrt(0.5 * (x**2 + y**2))) - math.exp(0.5 * (math.cos(2 * math.pi * x) + math.cos(2 * math.pi * y))) + 20 + math.exp(1)
+    return np.sum(x**2, axis=-1)
+
+def rastrigin(x):
+    x = np.asarray(x, dtype=float)
+
+    return 10 * x.shape[-1] + np.sum(x**2 - 10 * np.cos(2 * np.pi * x), axis=-1)
+
+def ackley(x):
+    x = np.asarray(x, dtype=float)
+
+    return (-20 * np.exp(-0.2 * np.sqrt(np.mean(x**2, axis=-1)))
+            - np.exp(np.mean(np.cos(2 * np.pi * x), axis=-1)) + 20 + math.e)
+
+def rosenbrock(x):
+    x = np.asarray(x, dtype=float)
+
+    return np.sum(100 * (x[..., 1:] - x[..., :-1]**2)**2 + (1 - x[..., :-1])**2,
+                  axis=-1)
+
+def griewank(x):
+    x = np.asarray(x, dtype=float)
+
+    i = np.arange(1, x.shape[-1] + 1)
+
+    return 1 + np.sum(x**2, axis=-1) / 4000 - np.prod(np.cos(x / np.sqrt(i)), axis=-1)
+
+def schwefel(x):
+    x = np.asarray(x, dtype=float)
+
+    return (418.9828872724338 * x.shape[-1]
+            - np.sum(x * np.sin(np.sqrt(np.abs(x))), axis=-1))
+
+# the usual search range of each function, the same on every dimension, and the
+# coordinate of its minimum, which is also the same on every dimension
+
+BOUNDS = {
+    'sphere': 100,
+    'rastrigin': 5.12,
+    'ackley': 32.768,
+    'rosenbrock': 2.048,
+    'griewank': 600,
+    'schwefel': 500
+}
+
+OPTIMA = {
+    'sphere': 0,
+    'rastrigin': 0,
+    'ackley': 0,
+    'rosenbrock': 1,
+    'griewank': 0,
+    'schwefel': 420.9687463599820
+}
+
+FUNCTIONS = {
+    'sphere': sphere,
+    'rastrigin': rastrigin,
+    'ackley': ackley,
+    'rosenbrock': rosenbrock,
+    'griewank': griewank,
+    'schwefel': schwefel
+}
+
+class Shifted(object):
+    """A function whose minimum, at optimum, is moved by shift."""
+
+    def __init__(self, function, shift, optimum=0):
+        self.function = function
+        self.shift = np.asarray(shift, dtype=float)
+        self.optimum = optimum + self.shift
+
+    def __call__(self, x):
+        return self.function(np.asarray(x, dtype=float) - self.shift)
+
+class Rotated(object):
+    """A function whose coordinates are rotated around its minimum, at
+    optimum, by an orthogonal matrix; the minimum stays in place.
+    """
+
+    def __init__(self, function, matrix, optimum=0):
+        self.function = function
+        self.matrix = np.asarray(matrix, dtype=float)
+        self.optimum = optimum + np.zeros(len(self.matrix))
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=float)
+
+        return self.function(np.dot(x - self.optimum, self.matrix) + self.optimum)
+
+class Benchmark(object):
+    """A function along with its search range and the point of its minimum."""
+
+    def __init__(self, function, lower_bounds, upper_bounds, optimum):
+        self.function = function
+        self.lower_bounds = lower_bounds
+        self.upper_bounds = upper_bounds
+        self.optimum = optimum
+
+    def __call__(self, x):
+        return self.function(x)
+
+def random_rotation(dimensions, random_state=np.random):
+    """Returns a random orthogonal matrix."""
+
+    q, r = np.linalg.qr(random_state.normal(size=(dimensions, dimensions)))
+
+    # the signs make the matrix uniformly distributed
+    return q * np.sign(np.diag(r))
+
+def benchmark(name, dimensions, shift=False, rotate=False, seed=None):
+    """Returns a Benchmark by name.
+
+    If shift is True, its minimum is moved to a random point within
+    80% of the bounds; if rotate is True, its coordinates are randomly rotated
+    around the minimum. seed makes both repeatable. Schwefel can be neither
+    shifted nor rotated, as it has lower values than its minimum outside its
+    bounds, which both would bring within them.
+
+    Arguments:
+    name -- one of the keys of FUNCTIONS
+    dimensions -- number of dimensions of the points
+    """
+
+    if name not in FUNCTIONS:
+        raise ValueError('unknown function: %r' % name)
+
+    if name == 'schwefel' and (shift or rotate):
+        raise ValueError('schwefel can not be shifted or rotated')
+
+    random_state = np.random.RandomState(seed)
+
+    bound = BOUNDS[name]
+    optimum = np.full(dimensions, float(OPTIMA[name]))
+
+    function = FUNCTIONS[name]
+
+    if shift:
+        target = random_state.uniform(-0.8 * bound, 0.8 * bound, dimensions)
+        function = Shifted(function, target - optimum, optimum)
+        optimum = function.optimum
+
+    if rotate:
+        function = Rotated(function, random_rotation(dimensions, random_state),
+                           optimum)
+
+    return Benchmark(function, [-bound] * dimensions, [bound] * dimensions, optimum)
+
+# the vectorized versions of the former 2-D functions; the functions above take
+# batches too
+sphere_batch = sphere
+rastrigin_batch = rastrigin
+ackley_batch = ackley
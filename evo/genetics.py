@@ -1,23 +1,82 @@
-import random
+from collections import OrderedDict
 
-from evo import EvolutionaryAlgorithm as EA, Generation
-from tools import RandomSelector
+import numpy as np
+
+from evo import EvolutionaryAlgorithm as EA
+from population import Population
+from tools import (RandomSelector, StochasticUniversalSelector,
+                   TournamentSelector, LRUCache)
 
 class BasicBinaryGA(EA):
-    """A basic binary genetic algorithm."""
+    """A basic binary genetic algorithm.
+
+    The genotype of an individual is a row of integers, each holding the
+    genelen bits of a gene, so the chromosome is never converted to a string:
+    crossover combines the parents through bit masks and mutation flips bits
+    with a random XOR mask, for all the children at once.
+
+    Arguments:
+    crossover -- 'one-point', 'multi-point' or 'uniform' (default 'one-point')
+    crossover_points -- number of cut points of the 'multi-point' crossover
+                        (default 2)
+    gray -- if True, the genes are Gray coded, so neighboring values differ in a
+            single bit (default False)
+    selection -- how parents are picked: 'roulette', 'sus' (stochastic
+                 universal sampling) or 'tournament' (default 'roulette')
+    tournament_size -- number of individuals competing in each tournament
+                       (default 2)
+    """
+
+    CROSSOVERS = ('one-point', 'multi-point', 'uniform')
+    SELECTIONS = ('roulette', 'sus', 'tournament')
+
+    _PHASES = EA._PHASES + ('_select_parents', '_crossover_masks', '_recall')
 
     def __init__(
             self,
             population_size=50,
             mutation_probability=0.01,
             num_elites=2,
-            genelen=15):
+            genelen=15,
+            cache_size=10000,
+            crossover='one-point',
+            crossover_points=2,
+            gray=False,
+            selection='roulette',
+            tournament_size=2):
+
+        if crossover not in self.CROSSOVERS:
+            raise ValueError('unknown crossover: %r' % crossover)
+
+        if selection not in self.SELECTIONS:
+            raise ValueError('unknown selection: %r' % selection)
 
         EA.__init__( self, population_size, mutation_probability, num_elites)
 
         self._genelen = genelen
         self._genotype_size = 2**genelen
 
+        # number of evaluated genotypes to remember, so repeated genotypes are
+        # not evaluated again; 0 disables the cache. The cache keeps the hit and
+        # miss statistics of the last run.
+        self._cache_size = cache_size
+
+        self._crossover_type = crossover
+        self._crossover_points = crossover_points
+        self._gray = gray
+
+        if selection == 'roulette':
+            self._selector = RandomSelector(self.random)
+        elif selection == 'sus':
+            self._selector = StochasticUniversalSelector(self.random)
+        else:
+            self._selector = TournamentSelector(tournament_size, self.random)
+
+        # weight of each bit of a gene, from the most significant
+        self._bit_weights = 1 << np.arange(genelen - 1, -1, -1)
+
+        self.cache = None
+
     def _init_algorithm(self):
         # genes represent a variable value; as genes have a length of genelen, we
         # can only represent 2^genelen values in the variable's domain, thus the
@@ -25,95 +84,298 @@ class BasicBinaryGA(EA):
         self._resolution = (float(self._domain.max - self._domain.min)
                            / (self._genotype_size - 1))
 
+        # the memoized values are only valid for the current problem
+        if self._cache_size:
+            self.cache = LRUCache(self._cache_size)
+
         self._init_population()
 
     def _evolve(self):
-        selector = RandomSelector()
+        population = self._population
+
+        # the best individuals are preserved
+        count = self._population_size - self._num_elites
+
+        # selection
+        parents = self._select_parents(-(-count // 2))
+
+        parents_a = population.vectors[parents[:, 0]]
+        parents_b = population.vectors[parents[:, 1]]
+
+        # crossover; the children take the masked bits from the other parent
+        swapped = (parents_a ^ parents_b) & self._crossover_masks(len(parents))
+
+        children = np.vstack((parents_a ^ swapped, parents_b ^ swapped))[:count]
+
+        # mutation
+        children ^= self._pack(self.random.random_sample(children.shape + (self._genelen,))
+                               < self._mutation_probability)
+
+        self._population = self._pick_elites()
+        self._population.append(Population(children, population.dtype))
+
+    def _select_parents(self, count):
+        """Picks count pairs of parents, as rows of the population."""
+
+        selector = self._selector
 
-        selector.assign([(i, self._fitness(i)) for i in self._population])
+        selector.assign(zip(range(len(self._population)),
+                            self._fitness(self._evaluate_population())))
 
-        # preserve the best individuals
-        children = self._pick_elites()
+        parents = np.array(selector.choose(2 * count)).reshape(count, 2)
 
-        while len(children) < self._population_size:
-            # selection
-            parents = selector.sample(2)
+        # the parents of a pair are drawn again while they are the same
+        # individual, but only a few times, as the weights may favor a single
+        # one
+        for attempt in range(10):
+            clones = parents[:, 0] == parents[:, 1]
 
-            # individuals must be encoded to its binary representation as
-            # required by the crossover and mutation operators
-            encoded_parents = map(self._encode, parents)
+            if not clones.any():
+                break
 
-            # crossover
-            decendents = self._crossover(*encoded_parents)
+            parents[clones, 1] = selector.choose(clones.sum())
 
-            # mutation
-            decendents = map(self._mutate, decendents)
+        return parents
 
-            children.extend(map(self._decode, decendents))
+    def _init_population(self):
+        # the vectors are the genotypes, the integer gene values
+        self._population = Population(
+                                self.random.randint(
+                                    self._genotype_size,
+                                    size=(self._population_size, self._dimensions)),
+                                int)
 
-        self._population = children
+    def _normalize(self, vectors):
+        return self._fenotype(vectors)
 
-    def _rand_individual(self):
-        return [random.randrange(self._genotype_size)
-                for d in range(self._dimensions)]
+    def _evaluate_population(self, population=None):
+        if population is None:
+            population = self._population
 
-    def _best(self):
-        self._get_fenotypes(self._population[0])
+        if self.cache is not None:
+            self._recall(population)
 
-    def _get_generation(self):
-        population = map(self._get_fenotypes, self._population)
+        return EA._evaluate_population(self, population)
 
-        best = population[0]
+    def _recall(self, population):
+        """Sets the values of a population from the genotypes cache.
 
-        return Generation(population, (best, self._function(*best)))
+        Genotypes not in the cache are evaluated once, even if several
+        individuals share them, and then cached.
+        """
 
-    def _evaluate(self, individual):
-        individual = self._get_fenotypes(individual)
+        missing = OrderedDict()
 
-        return self._function(*individual)
+        for i in np.flatnonzero(np.isnan(population.values)):
+            genotype = tuple(population.vectors[i])
+
+            if genotype in missing:
+                missing[genotype].append(i)
+                continue
+
+            value = self.cache.get(genotype)
+
+            if value is None:
+                missing[genotype] = [i]
+            else:
+                population.values[i] = value
+
+        if not missing:
+            return
+
+        values = self._evaluate_vectors(self._fenotype(np.array(missing.keys())))
+
+        for (genotype, rows), value in zip(missing.items(), values):
+            self.cache.put(genotype, value)
+
+            population.values[rows] = value
 
     def _fenotype(self, genotype):
-        return self._domain.min + genotype * self._resolution
+        return self._domain.min + self._decode(genotype) * self._resolution
+
+    def _decode(self, genotype):
+        """Returns the integer values of the genes."""
+
+        if not self._gray:
+            return genotype
+
+        # each bit of the value is the XOR of the Gray code bits down to it
+        values = np.array(genotype)
+        shift = 1
+
+        while shift < self._genelen:
+            values ^= values >> shift
+            shift *= 2
+
+        return values
+
+    def _crossover_masks(self, count):
+        """Returns the bits each pair of parents exchanges as gene masks."""
+
+        length = self._dimensions * self._genelen
+
+        if self._crossover_type == 'uniform':
+            bits = self.random.random_sample((count, length)) < 0.5
+        else:
+            if self._crossover_type == 'one-point':
+                points = 1
+            else:
+                points = min(self._crossover_points, length - 1)
+
+            # distinct cut points, between the first and last bits
+            cuts = np.argsort(self.random.random_sample((count, length - 1)),
+                              axis=1)[:, :points] + 1
+
+            # bits past an odd number of cuts are exchanged
+            passed = np.zeros((count, length + 1), dtype=int)
+            np.add.at(passed, (np.arange(count)[:, np.newaxis], cuts), 1)
+
+            bits = np.cumsum(passed[:, :length], axis=1) % 2 == 1
+
+        return self._pack(bits.reshape(count, self._dimensions, self._genelen))
+
+    def _pack(self, bits):
+        """Packs an array of genelen bits per gene into the gene integers."""
+
+        return np.dot(bits, self._bit_weights)
+
+class RealCodedGA(EA):
+    """A genetic algorithm working directly on the real valued solutions.
+
+    Parents are picked by tournament, recombined with simulated binary
+    crossover (SBX) and mutated with polynomial mutation, all within the bounds
+    of each parameter and for the whole population at once. The elites are
+    kept unchanged.
+
+    Arguments:
+    mutation_probability -- probability of mutating each parameter; None uses
+                            1 / dimensions (default None)
+    crossover_probability -- probability of recombining a pair of parents,
+                             otherwise the children are copies (default 0.9)
+    crossover_index -- distribution index of SBX; the larger, the closer the
+                       children are to their parents (default 15)
+    mutation_index -- distribution index of the polynomial mutation; the
+                      larger, the smaller the mutations (default 20)
+    tournament_size -- number of individuals competing to be a parent
+                       (default 2)
+    """
+
+    _PHASES = EA._PHASES + ('_tournament', '_crossover', '_mutate')
+
+    def __init__(
+            self,
+            population_size=50,
+            mutation_probability=None,
+            num_elites=2,
+            crossover_probability=0.9,
+            crossover_index=15,
+            mutation_index=20,
+            tournament_size=2):
+
+        EA.__init__(self, population_size, mutation_probability, num_elites)
+
+        self._crossover_probability = crossover_probability
+        self._crossover_index = crossover_index
+        self._mutation_index = mutation_index
+        self._tournament_size = tournament_size
+
+    def _evolve(self):
+        population = self._population
+
+        # the best individuals are preserved
+        count = self._population_size - self._num_elites
+        pairs = -(-count // 2)
+
+        parents = population.vectors[self._tournament(2 * pairs)]
+
+        children = self._crossover(parents[:pairs], parents[pairs:])
+        children = self._mutate(children[:count])
+
+        self._population = self._pick_elites()
+        self._population.append(Population(children, population.dtype))
+
+    def _tournament(self, count):
+        """Returns the rows of count tournament winners."""
+
+        entrants = self.random.randint(len(self._population),
+                                       size=(count, self._tournament_size))
+
+        # the population is sorted, so the winner is the first entrant
+        return entrants.min(axis=1)
+
+    def _crossover(self, parents_a, parents_b):
+        """Simulated binary crossover, bounded; returns both sets of children."""
+
+        lower, upper = self._lower_bounds, self._upper_bounds
+        exponent = 1.0 / (self._crossover_index + 1)
+
+        low = np.minimum(parents_a, parents_b)
+        high = np.maximum(parents_a, parents_b)
+        spread = high - low
+
+        # each parameter of a recombined pair is crossed with probability 0.5,
+        # if the parents differ on it
+        crossed = ((self.random.random_sample(parents_a.shape) < 0.5)
+                   & (spread > 1e-14)
+                   & (self.random.random_sample((len(parents_a), 1))
+                      < self._crossover_probability))
+
+        spread = np.where(crossed, spread, 1)
+
+        def spread_factor(distance_to_bound):
+            # the distribution is truncated so the child lies within the bound
+            beta = 1 + 2 * np.maximum(distance_to_bound, 0) / spread
+            alpha = 2 - beta**-(self._crossover_index + 1)
+
+            u = self.random.random_sample(parents_a.shape)
+
+            return np.where(
+                    u <= 1 / alpha,
+                    (u * alpha)**exponent,
+                    (1 / np.maximum(2 - u * alpha, 1e-14))**exponent)
+
+        middle = (low + high) / 2
+
+        child_low = middle - spread_factor(low - lower) * spread / 2
+        child_high = middle + spread_factor(upper - high) * spread / 2
+
+        # either child may go to either side
+        swap = self.random.random_sample(parents_a.shape) < 0.5
 
-    def _get_fenotypes(self, individual):
-        return map(self._fenotype, individual)
+        children_a = np.where(swap, child_high, child_low)
+        children_b = np.where(swap, child_low, child_high)
 
-    def _crossover(self, parent_a, parent_b):
-        cross_point = random.randrange(1, len(parent_a))
+        children = np.vstack((np.where(crossed, children_a, parents_a),
+                              np.where(crossed, children_b, parents_b)))
 
-        child_a = parent_a[:cross_point] + parent_b[cross_point:]
-        child_b = parent_b[:cross_point] + parent_a[cross_point:]
+        return np.clip(children, lower, upper)
 
-        return child_a, child_b
+    def _mutate(self, vectors):
+        """Polynomial mutation, bounded."""
 
-    def _mutate(self, individual):
-        mutated = list(individual)
+        lower, upper = self._lower_bounds, self._upper_bounds
+        probability = self._mutation_probability
 
-        for index, bit in enumerate(individual):
-            if random.random() < self._mutation_probability:
-                if bit is '1':
-                    mutated[index] = '0'
-                else:
-                    mutated[index] = '1'
+        if probability is None:
+            probability = 1.0 / self._dimensions
 
-        return ''.join(mutated)
+        mutated = self.random.random_sample(vectors.shape) < probability
 
-    def _encode(self, individual):
-        return ''.join(map(self._gene_bits, individual))
+        width = upper - lower
+        power = self._mutation_index + 1
 
-    def _decode(self, chromosome):
-        individual = []
+        u = self.random.random_sample(vectors.shape)
 
-        while chromosome:
-            bits = chromosome[:self._genelen]
-            value = self._gene_value(bits)
-            individual.append(value)
-            chromosome = chromosome[self._genelen:]
+        # the perturbation shrinks towards the bound it moves to
+        below = 1 - (vectors - lower) / width
+        above = 1 - (upper - vectors) / width
 
-        return individual
+        with np.errstate(invalid='ignore'):
+            delta = np.where(
+                u < 0.5,
+                (2 * u + (1 - 2 * u) * below**power)**(1.0 / power) - 1,
+                1 - (2 * (1 - u) + 2 * (u - 0.5) * above**power)**(1.0 / power))
 
-    def _gene_bits(self, value):
-        return format(value, 'b').zfill(self._genelen)
+        vectors = np.where(mutated, vectors + delta * width, vectors)
 
-    def _gene_value(self, bits):
-        return int(bits, 2)
+        return np.clip(vectors, lower, upper)
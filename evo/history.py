@@ -0,0 +1,501 @@
+import os
+import glob
+import json
+import numpy as np
+from collections import namedtuple
+
+# values holds the objective values of the population, when they are known
+Generation = namedtuple('Generation', ['population', 'best', 'values'])
+Generation.__new__.__defaults__ = (None,)
+
+class History(object):
+    """Records the generations of a run in preallocated arrays.
+
+    A history is a sequence of Generation tuples, from the oldest to the latest
+    recorded; the population of each is a view of the stored block, so it must
+    be copied to be kept after the history is modified.
+
+    Arguments:
+    stride -- records one of every stride generations (default 1)
+    capacity -- maximum number of generations kept; once full, the latest
+                generation replaces the oldest one. None keeps them all, and 0
+                records nothing (default None)
+    populations -- if False, only the best of each generation is recorded
+                   (default True)
+    """
+
+    def __init__(self, stride=1, capacity=None, populations=True):
+        self.stride = stride
+        self.capacity = capacity
+        self.populations = populations
+
+        self.clear()
+
+    def clear(self):
+        self._count = 0
+        self._reserved = 0
+
+        self._indices = None
+        self._populations = None
+        self._population_values = None
+        self._best = None
+        self._values = None
+
+    def close(self):
+        """Called once the run is over."""
+
+        pass
+
+    def reserve(self, count):
+        """Hints the number of generations a run will go through at most;
+        only one of every stride of them is recorded.
+        """
+
+        self._reserved = -(-count // self.stride)
+
+    def accepts(self, index):
+        """Tells if the generation with the given index is to be recorded."""
+
+        return self.capacity != 0 and index % self.stride == 0
+
+    def record(self, index, generation):
+        population = np.asarray(generation.population)
+        best, value = generation.best
+
+        if self._indices is None:
+            self._allocate(population, best)
+        elif self.capacity is None and self._count == len(self._indices):
+            self._grow()
+
+        if self.capacity is None:
+            slot = self._count
+        else:
+            slot = self._count % self.capacity
+
+        self._indices[slot] = index
+        self._best[slot] = best
+        self._values[slot] = value
+
+        if self.populations:
+            self._populations[slot] = population
+
+            if generation.values is not None:
+                self._population_values[slot] = generation.values
+            else:
+                self._population_values[slot] = np.nan
+
+        self._count += 1
+
+    @property
+    def indices(self):
+        """Numbers of the recorded generations."""
+
+        return np.array([self._indices[self._slot(i)] for i in range(len(self))],
+                        dtype=int)
+
+    @property
+    def best_values(self):
+        """Objective values of the best of each recorded generation."""
+
+        return np.array([self._values[self._slot(i)] for i in range(len(self))])
+
+    def __len__(self):
+        if self.capacity is None:
+            return self._count
+        else:
+            return min(self._count, self.capacity)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+
+        if not 0 <= i < len(self):
+            raise IndexError('history index out of range')
+
+        slot = self._slot(i)
+
+        if self.populations:
+            population = self._populations[slot]
+            values = self._population_values[slot]
+        else:
+            population = None
+            values = None
+
+        return Generation(
+                    population,
+                    (self._best[slot], self._values[slot]),
+                    values)
+
+    _ARRAYS = ['_indices', '_populations', '_population_values', '_best',
+               '_values']
+
+    def __getstate__(self):
+        # only the recorded generations are pickled, e.g. in a checkpoint,
+        # oldest first, rather than the whole preallocated block
+        state = dict(self.__dict__)
+
+        order = np.array([self._slot(i) for i in range(len(self))], dtype=int)
+
+        for name in self._ARRAYS:
+            if state[name] is not None:
+                state[name] = state[name][order]
+
+        state['_count'] = len(self)
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        if self._indices is None:
+            return
+
+        # the block is allocated again with room for the rest of the run
+        if self.capacity is not None:
+            size = self.capacity
+        else:
+            size = max(self._reserved, self._count, 1)
+
+        for name in self._ARRAYS:
+            array = getattr(self, name)
+
+            if array is not None:
+                block = np.empty((size,) + array.shape[1:], dtype=array.dtype)
+                block[:len(array)] = array
+
+                setattr(self, name, block)
+
+    def _slot(self, i):
+        # once a bounded history is full, the oldest generation is the one that
+        # is replaced next
+        if self.capacity is not None and self._count > self.capacity:
+            return (self._count + i) % self.capacity
+
+        return i
+
+    def _allocate(self, population, best):
+        if self.capacity is not None:
+            size = self.capacity
+        else:
+            size = max(self._reserved, 1)
+
+        self._indices = np.zeros(size, dtype=int)
+        self._best = np.zeros((size,) + np.shape(best))
+        self._values = np.zeros(size)
+
+        if self.populations:
+            # record fills every slot it uses, so the memory of the slots is
+            # only touched as the generations are recorded
+            self._populations = np.empty((size,) + population.shape,
+                                         dtype=population.dtype)
+            self._population_values = np.empty((size, len(population)))
+
+    def _grow(self):
+        size = len(self._indices)
+
+        self._indices = np.resize(self._indices, 2 * size)
+        self._best = np.resize(self._best, (2 * size,) + self._best.shape[1:])
+        self._values = np.resize(self._values, 2 * size)
+
+        if self.populations:
+            self._populations = np.resize(
+                                    self._populations,
+                                    (2 * size,) + self._populations.shape[1:])
+            self._population_values = np.resize(
+                                    self._population_values,
+                                    (2 * size,) + self._population_values.shape[1:])
+
+class DiskHistory(object):
+    """Streams the recorded generations to a directory instead of keeping them
+    in memory.
+
+    The generations are written to fixed size segments of .npy files, which
+    are memory mapped while being filled, and an index.json file describes
+    them. The directory can be read back, even while the run goes on, with a
+    HistoryReader; a DiskHistory is also a sequence of Generation tuples.
+
+    The index is updated each time a segment is filled and when the run is
+    over, so if the run is interrupted only the generations of complete
+    segments can be read.
+
+    Arguments:
+    path -- directory where the history is written; files from a previous
+            history in it are removed when a run starts, so a run resumed from
+            a checkpoint can still find them
+    stride -- records one of every stride generations (default 1)
+    segment_size -- number of generations stored in each segment (default 100)
+    populations -- if False, only the best of each generation is recorded
+                   (default True)
+    """
+
+    _FIELDS = ['indices', 'best', 'best_values', 'populations', 'values']
+
+    def __init__(self, path, stride=1, segment_size=100, populations=True):
+        self.path = path
+        self.stride = stride
+        self.segment_size = segment_size
+        self.populations = populations
+
+        self._reader = None
+
+        self._count = 0
+        self._segment = None
+
+    def clear(self):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        for filename in glob.glob(os.path.join(self.path, 'segment-*.npy')):
+            os.remove(filename)
+
+        self._count = 0
+        self._segment = None
+
+        self._write_index()
+
+    def reserve(self, count):
+        pass
+
+    def accepts(self, index):
+        return index % self.stride == 0
+
+    def record(self, index, generation):
+        population = np.asarray(generation.population)
+        best, value = generation.best
+
+        slot = self._count % self.segment_size
+
+        if slot == 0:
+            self._open_segment(population, best)
+
+        segment = self._segment
+
+        segment['indices'][slot] = index
+        segment['best'][slot] = best
+        segment['best_values'][slot] = value
+
+        if self.populations:
+            segment['populations'][slot] = population
+
+            if generation.values is not None:
+                segment['values'][slot] = generation.values
+
+        self._count += 1
+        self._reader = None
+
+        if self._count % self.segment_size == 0:
+            self._flush()
+
+    def close(self):
+        self._flush()
+
+    @property
+    def indices(self):
+        return self._read().indices
+
+    @property
+    def best_values(self):
+        return self._read().best_values
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return self._read()[i]
+
+    def _open_segment(self, population, best):
+        self._flush()
+
+        shapes = {
+            'indices': ((), int),
+            'best': (np.shape(best), float),
+            'best_values': ((), float),
+            'populations': (population.shape, population.dtype),
+            'values': ((len(population),), float)
+        }
+
+        fields = self._FIELDS if self.populations else self._FIELDS[:3]
+
+        number = self._count // self.segment_size
+
+        self._segment = {}
+
+        for field in fields:
+            shape, dtype = shapes[field]
+
+            self._segment[field] = np.lib.format.open_memmap(
+                                        _segment_filename(self.path, number, field),
+                                        mode='w+',
+                                        dtype=dtype,
+                                        shape=(self.segment_size,) + shape)
+
+        if self.populations:
+            self._segment['values'][:] = np.nan
+
+    def _flush(self):
+        if self._segment is not None:
+            for array in self._segment.values():
+                array.flush()
+
+        self._write_index()
+
+    def _write_index(self):
+        index = {
+            'count': self._count,
+            'segment_size': self.segment_size,
+            'populations': self.populations
+        }
+
+        with open(os.path.join(self.path, 'index.json'), 'w') as f:
+            json.dump(index, f)
+
+        self._reader = None
+
+    def _read(self):
+        if self._reader is None:
+            self._flush()
+            self._reader = HistoryReader(self.path)
+
+        return self._reader
+
+    def __getstate__(self):
+        # the generations are in the files, so only the position in them is
+        # pickled, e.g. in a checkpoint
+        self._flush()
+
+        state = dict(self.__dict__)
+        state['_segment'] = None
+        state['_reader'] = None
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        # maps again the segment being filled; generations recorded after the
+        # state was pickled are overwritten
+        number, slot = divmod(self._count, self.segment_size)
+
+        if slot:
+            fields = self._FIELDS if self.populations else self._FIELDS[:3]
+
+            self._segment = dict(
+                (field, np.load(_segment_filename(self.path, number, field),
+                                mmap_mode='r+'))
+                for field in fields)
+
+        self._write_index()
+
+class HistoryReader(object):
+    """Reads a history written by a DiskHistory.
+
+    A reader is a sequence of Generation tuples, loaded lazily from the memory
+    mapped segments, so a run can be gone through frame by frame, e.g. by
+    EvoPlot, without loading all of it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, 'index.json')) as f:
+            index = json.load(f)
+
+        self._count = index['count']
+        self._segment_size = index['segment_size']
+        self._populations = index['populations']
+
+        # the last segment read is kept open, as generations are usually read
+        # in order
+        self._number = None
+        self._segment = None
+
+    @property
+    def indices(self):
+        return self._concatenate('indices')
+
+    @property
+    def best_values(self):
+        return self._concatenate('best_values')
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+
+        if not 0 <= i < len(self):
+            raise IndexError('history index out of range')
+
+        number, slot = divmod(i, self._segment_size)
+        segment = self._load(number)
+
+        if self._populations:
+            population = segment['populations'][slot]
+            values = segment['values'][slot]
+        else:
+            population = None
+            values = None
+
+        return Generation(
+                    population,
+                    (segment['best'][slot], segment['best_values'][slot]),
+                    values)
+
+    def _load(self, number):
+        if number != self._number:
+            fields = DiskHistory._FIELDS
+
+            if not self._populations:
+                fields = fields[:3]
+
+            self._segment = dict((field, np.load(
+                                            _segment_filename(self.path, number, field),
+                                            mmap_mode='r'))
+                                 for field in fields)
+            self._number = number
+
+        return self._segment
+
+    def _concatenate(self, field):
+        segments = -(-self._count // self._segment_size)
+
+        arrays = [self._load(number)[field] for number in range(segments)]
+
+        if not arrays:
+            return np.zeros(0)
+
+        return np.concatenate(arrays)[:self._count]
+
+def _segment_filename(path, number, field):
+    return os.path.join(path, 'segment-%05d-%s.npy' % (number, field))
+
+def create_history(history):
+    """Returns the History for the history option of optimize.
+
+    history may be a History or a DiskHistory, or one of the strings 'full', 'none', 'best-only',
+    'every-K' to record one of every K generations, or 'last-K' to keep only the
+    last K generations.
+    """
+
+    if isinstance(history, (History, DiskHistory)):
+        history.clear()
+
+        return history
+
+    if history == 'full':
+        return History()
+    elif history == 'none':
+        return History(capacity=0)
+    elif history == 'best-only':
+        return History(populations=False)
+
+    mode, _, count = history.partition('-')
+
+    if count.isdigit() and int(count) > 0:
+        if mode == 'every':
+            return History(stride=int(count))
+        elif mode == 'last':
+            return History(capacity=int(count))
+
+    raise ValueError('unknown history mode: %r' % history)
@@ -0,0 +1,290 @@
+import inspect
+import traceback
+import multiprocessing
+import numpy as np
+from collections import namedtuple
+
+from tools import create_random, seed_words, spawn_seeds
+
+# the outcome of the run of an island; best_values holds the best value of each
+# of its generations
+IslandStats = namedtuple('IslandStats', ['best', 'value', 'evaluations',
+                                         'generations', 'stop_reason',
+                                         'best_values'])
+
+class IslandModel:
+    """Runs several algorithms, the islands, each in its own process, which
+    exchange some of their best solutions every few generations.
+
+    The migrants are sent as they are stored in the populations, so the islands
+    should run algorithms with the same representation, e.g. instances of the
+    same class, possibly with different parameters. As the algorithms run in
+    the island processes, the given instances are left as they were.
+
+    Arguments:
+    algorithms -- the EvolutionaryAlgorithm instances run on each island
+    topology -- where the migrants of each island go: 'ring', to the next
+                island; 'full', to every other island, which keeps the best
+                migrants it gets; or 'random', to another island drawn on each
+                migration (default 'ring')
+    interval -- number of generations between migrations (default 10)
+    migrants -- number of solutions each island sends (default 2)
+    replacement -- which solutions the migrants replace: 'worst', 'random'
+                   (any but the best) or 'worst-if-better', the worst ones
+                   only if the migrants are better (default 'worst')
+    """
+
+    TOPOLOGIES = ('ring', 'full', 'random')
+    REPLACEMENTS = ('worst', 'random', 'worst-if-better')
+
+    def __init__(
+            self,
+            algorithms,
+            topology='ring',
+            interval=10,
+            migrants=2,
+            replacement='worst'):
+
+        if topology not in self.TOPOLOGIES:
+            raise ValueError('unknown topology: %r' % topology)
+
+        if replacement not in self.REPLACEMENTS:
+            raise ValueError('unknown replacement: %r' % replacement)
+
+        self.algorithms = list(algorithms)
+        self.topology = topology
+        self.interval = interval
+        self.migrants = migrants
+        self.replacement = replacement
+
+        self.islands = []
+
+        # the streams of the islands are spawned from this one
+        self.random = create_random()
+
+    def seed(self, seed=None):
+        """Seeds the random stream the islands streams are spawned from."""
+
+        self.random.seed(seed_words(seed))
+
+    def optimize(
+            self,
+            function,
+            domain=(-100, 100),
+            lower_bounds=[],
+            upper_bounds=[],
+            problem_type='min',
+            max_generations=100,
+            vectorized=False,
+            dtype=np.float64,
+            termination=None,
+            dimensions=None):
+        """Runs the islands and returns the best solution found by any of them.
+
+        Takes the arguments of EvolutionaryAlgorithm.optimize; termination
+        applies to each island separately. The statistics of each island are
+        left in the islands attribute, as IslandStats, and the total number of
+        evaluations in evaluations.
+        """
+
+        self._problem_type = problem_type
+
+        options = {
+            'function': function,
+            'lower_bounds': lower_bounds,
+            'upper_bounds': upper_bounds,
+            'problem_type': problem_type,
+            'vectorized': vectorized,
+            'dtype': dtype,
+            'termination': termination,
+            'dimensions': dimensions
+        }
+
+        # each island gets its own random stream
+        seeds = spawn_seeds(self.random, len(self.algorithms))
+
+        connections = []
+        processes = []
+
+        try:
+            for algorithm, seed in zip(self.algorithms, seeds):
+                island_options = dict(options)
+
+                if 'domain' in inspect.getargspec(algorithm.optimize_iter).args:
+                    island_options['domain'] = domain
+
+                connection, island_connection = multiprocessing.Pipe()
+
+                process = multiprocessing.Process(
+                                target=_run_island,
+                                args=(algorithm, island_options, max_generations,
+                                      self.interval, self.migrants,
+                                      self.replacement, seed, island_connection))
+                process.daemon = True
+                process.start()
+
+                connections.append(connection)
+                processes.append(process)
+
+            self.islands = self._migrate(connections)
+        finally:
+            for process in processes:
+                process.join(1)
+
+                if process.is_alive():
+                    process.terminate()
+
+        self.evaluations = sum(island.evaluations for island in self.islands)
+
+        best = min(self.islands, key=lambda island: self._objective(island.value))
+
+        return best.best
+
+    def _migrate(self, connections):
+        """Exchanges the migrants of the islands until all of them are done;
+        returns their statistics.
+        """
+
+        stats = [None] * len(connections)
+        running = range(len(connections))
+
+        while running:
+            emigrants = {}
+
+            for i in running:
+                message = connections[i].recv()
+
+                if message[0] == 'error':
+                    raise RuntimeError('island %d failed:\n%s' % (i, message[1]))
+                elif message[0] == 'done':
+                    stats[i] = message[1]
+                else:
+                    emigrants[i] = message[1:]
+
+            # islands which are done no longer send or receive migrants
+            running = sorted(emigrants)
+
+            for i in running:
+                sources = self._sources(i, running)
+
+                if not sources:
+                    # the last island running gets no migrants
+                    vectors, values = emigrants[i]
+
+                    connections[i].send((vectors[:0], values[:0]))
+                    continue
+
+                vectors = np.concatenate([emigrants[j][0] for j in sources])
+                values = np.concatenate([emigrants[j][1] for j in sources])
+
+                # an island keeps the best of the migrants it gets
+                best = np.argsort(self._objective(values),
+                                  kind='mergesort')[:self.migrants]
+
+                connections[i].send((vectors[best], values[best]))
+
+        return stats
+
+    def _sources(self, i, running):
+        """Returns the islands sending their migrants to island i."""
+
+        others = [j for j in running if j != i]
+
+        if not others:
+            return []
+        elif self.topology == 'ring':
+            return [running[running.index(i) - 1]]
+        elif self.topology == 'full':
+            return others
+        else:
+            return [others[self.random.randint(len(others))]]
+
+    def _objective(self, values):
+        if self._problem_type == 'max':
+            return np.negative(values)
+        else:
+            return values
+
+def _run_island(algorithm, options, max_generations, interval, migrants,
+                replacement, seed, connection):
+    """Runs an algorithm in an island process, exchanging migrants through
+    connection.
+    """
+
+    try:
+        algorithm.seed(seed)
+
+        states = algorithm.optimize_iter(**options)
+
+        best_values = []
+        stop_reason = None
+
+        for state in states:
+            best_values.append(state.value)
+
+            if algorithm.stop_reason:
+                stop_reason = algorithm.stop_reason
+            elif (max_generations is not None
+                    and state.generation >= max_generations):
+                stop_reason = 'max_generations'
+            elif state.generation and state.generation % interval == 0:
+                emigrants, values = _emigrants(algorithm, migrants)
+
+                connection.send(('migrants', emigrants, values))
+
+                _immigrate(algorithm, replacement, *connection.recv())
+
+            if stop_reason:
+                states.close()
+                break
+
+        # the algorithm may also stop on its own, e.g. BacterialForaging
+        stop_reason = stop_reason or algorithm.stop_reason
+
+        connection.send(('done', IslandStats(
+                                    algorithm._best(),
+                                    state.value,
+                                    algorithm.evaluations,
+                                    state.generation,
+                                    stop_reason,
+                                    np.array(best_values))))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+
+def _emigrants(algorithm, count):
+    """Returns the vectors and values of the best count solutions."""
+
+    population = algorithm._population
+    values = algorithm._evaluate_population()
+
+    best = np.argsort(algorithm._objective(values), kind='mergesort')[:count]
+
+    return population.vectors[best].copy(), values[best].copy()
+
+def _immigrate(algorithm, replacement, vectors, values):
+    """Places the migrants in the population of an algorithm."""
+
+    if not len(vectors):
+        return
+
+    objective = algorithm._objective(algorithm._evaluate_population())
+    order = np.argsort(objective, kind='mergesort')
+
+    count = min(len(vectors), len(order) - 1)
+
+    if replacement == 'random':
+        rows = order[1:][algorithm.random.permutation(len(order) - 1)[:count]]
+    else:
+        rows = order[::-1][:count]
+
+    vectors = vectors[:count]
+    values = values[:count]
+
+    if replacement == 'worst-if-better':
+        # the best migrants compete with the worst solutions
+        better = algorithm._objective(values) < objective[rows]
+
+        rows, vectors, values = rows[better], vectors[better], values[better]
+
+    if len(rows):
+        algorithm._replace(rows, vectors, values)
@@ -1,86 +1,185 @@
-import random
-import copy
 import numpy as np
 
-from evo import EvolutionaryAlgorithm as EA, Generation
-
-class Particle:
-    def __init__(self, position):
-        self.position = position
-        self.velocity = np.zeros(len(position))
-
-        self.set_best_position(position)
-
-    def set_best_position(self, position):
-        self.best_position = copy.copy(position)
+from evo import EvolutionaryAlgorithm as EA
 
 class ParticleSwarm(EA):
     """Optimize a function using the Particle Swarm Optimization approach.
 
-    Implements a gbest (global best) topology.
+    Besides their positions, the particles velocities and best positions (and
+    the values of these) are stored as fields of the population, and the whole
+    swarm is updated at once.
+
+    Arguments:
+    topology -- which particles inform each particle: 'gbest', the best
+                particle of the swarm; 'ring', the neighbors by index;
+                'von-neumann', the neighbors on a grid; or 'random', fixed
+                random informants (default 'gbest')
+    neighborhood_size -- number of particles, including itself, that inform a
+                         particle in the 'ring' and 'random' topologies; it
+                         is always 5 for 'von-neumann' (default 3)
+    inertia -- weight of the previous velocity; None keeps all of it, as in the
+               original PSO (default None)
+    constriction -- if True, the velocity is scaled by the Clerc-Kennedy
+                    constriction coefficient computed from the cognition and
+                    social rates, whose sum must exceed 4 (default False)
     """
 
+    TOPOLOGIES = ('gbest', 'ring', 'von-neumann', 'random')
+
+    _PHASES = EA._PHASES + ('_best_neighbors',)
+
     def __init__(
             self,
             population_size=100,
             num_elites=2,
             max_cognition_rate=2.05,
             max_social_rate=2.05,
-            max_velocity=20):
+            max_velocity=20,
+            topology='gbest',
+            neighborhood_size=3,
+            inertia=None,
+            constriction=False):
+
+        if topology not in self.TOPOLOGIES:
+            raise ValueError('unknown topology: %r' % topology)
+
+        if constriction and max_cognition_rate + max_social_rate <= 4:
+            raise ValueError('constriction requires max_cognition_rate + '
+                             'max_social_rate > 4')
 
         EA.__init__(self, population_size, 0, num_elites)
 
         self._max_cognition_rate = max_cognition_rate
         self._max_social_rate = max_social_rate
         self._max_velocity = max_velocity
+        self._topology = topology
+        self._neighborhood_size = neighborhood_size
+        self._inertia = inertia
+
+        if constriction:
+            phi = max_cognition_rate + max_social_rate
+
+            self._constriction = 2 / abs(2 - phi - np.sqrt(phi**2 - 4 * phi))
+        else:
+            self._constriction = 1
+
+    def _init_population(self):
+        EA._init_population(self)
+
+        population = self._population
+
+        population.add_field('velocities', (self._dimensions,), population.dtype)
+        population.add_field('best_vectors', (self._dimensions,), population.dtype)
+        population.add_field('best_values', fill=np.nan)
+
+        population.best_vectors[:] = population.vectors
+        population.best_values[:] = self._evaluate_population()
+
+        # the rows are sorted each generation, so the neighborhoods are defined
+        # between particle ids, which move along with the rows
+        population.add_field('ids', dtype=int)
+        population.ids[:] = np.arange(len(population))
+
+        self._neighbors = self._build_neighbors(len(population))
+
+    def _build_neighbors(self, size):
+        """Returns the ids of the particles informing each particle, by id."""
+
+        ids = np.arange(size)[:, np.newaxis]
+
+        if self._topology == 'ring':
+            radius = self._neighborhood_size // 2
+
+            return (ids + np.arange(-radius, radius + 1)) % size
+        elif self._topology == 'von-neumann':
+            # the particles are laid out on a grid, row by row, which wraps
+            # around at the edges; the last row may be incomplete, so the
+            # neighbors past the last particle are replaced by it
+            columns = int(np.ceil(np.sqrt(size)))
+
+            left = ids - ids % columns + (ids - 1) % columns
+            right = ids - ids % columns + (ids + 1) % columns
+
+            return np.hstack((ids,
+                              np.minimum(left, size - 1),
+                              np.minimum(right, size - 1),
+                              (ids - columns) % size,
+                              (ids + columns) % size))
+        elif self._topology == 'random':
+            informants = self.random.randint(
+                                size,
+                                size=(size, self._neighborhood_size - 1))
+
+            return np.hstack((ids, informants))
 
     def _evolve(self):
-        best_neighbor = EA._best(self)
-        elites = self._pick_elites()
+        population = self._population
+
+        # the elites, at the first rows, are not moved
+        moving = slice(self._num_elites, None)
+        count = len(population) - self._num_elites
+
+        positions = population.vectors[moving]
+        velocities = population.velocities[moving]
+
+        cognition_rates = self.random.uniform(0, self._max_cognition_rate, (count, 1))
+        social_rates = self.random.uniform(0, self._max_social_rate, (count, 1))
+
+        if self._inertia is not None:
+            velocities *= self._inertia
+
+        # update velocities
+        velocities += (social_rates
+                       * (self._best_neighbors()[moving] - positions)
+                       + cognition_rates
+                       * (population.best_vectors[moving] - positions))
+
+        velocities *= self._constriction
+
+        # velocity limiting
+        magnitudes = np.linalg.norm(velocities, axis=1)
+        too_fast = magnitudes > self._max_velocity
 
-        for particle in self._population:
-            cognition_rate = np.random.uniform(0, self._max_cognition_rate)
-            social_rate = np.random.uniform(0, self._max_social_rate)
+        velocities[too_fast] *= (self._max_velocity
+                                 / magnitudes[too_fast])[:, np.newaxis]
 
-            # update velocity
-            particle.velocity += (social_rate
-                                  * (best_neighbor.position - particle.position)
-                                  + cognition_rate
-                                  * (particle.best_position - particle.position))
+        # update particles positions
+        positions += velocities
 
-            # velocity limiting
-            magnitude = np.linalg.norm(particle.velocity)
+        population.invalidate(moving)
 
-            if magnitude > self._max_velocity:
-                particle.velocity = (particle.velocity / magnitude
-                                     * self._max_velocity)
+        # update best positions; all the particles are evaluated at once, while
+        # the values of the best positions are already stored
+        values = self._evaluate_population()
 
-            # update particle position
-            particle.position += particle.velocity
+        improved = self._fitness(values) > self._fitness(population.best_values)
 
-            # update best position
-            if self._fitness(particle) > self._fitness(Particle(particle.best_position)):
-                particle.set_best_position(particle.position)
+        population.best_vectors[improved] = population.vectors[improved]
+        population.best_values[improved] = values[improved]
 
-        self._population.extend(elites)
+    def _replace(self, rows, vectors, values):
+        # the new particles start at rest on their best positions
+        self._population.velocities[rows] = 0
+        self._population.best_vectors[rows] = vectors
+        self._population.best_values[rows] = values
 
-    def _rand_individual(self):
-        position = EA._rand_individual(self)
+        EA._replace(self, rows, vectors, values)
 
-        return Particle(position)
+    def _best_neighbors(self):
+        """Returns the position each particle is attracted to by its neighbors."""
 
-    def _evaluate(self, particle):
-        return self._function(*particle.position)
+        population = self._population
 
-    def _best(self):
-        best = EA._best(self)
+        if self._topology == 'gbest':
+            # the population is sorted, so the first particle is the global best
+            return np.tile(population.vectors[0], (len(population), 1))
 
-        return copy.copy(best.position)
+        rows = np.empty(len(population), dtype=int)
+        rows[population.ids] = np.arange(len(population))
 
-    def _get_generation(self):
-        positions = [copy.copy(particle.position)
-                     for particle in self._population]
+        neighbors = rows[self._neighbors[population.ids]]
 
-        best = positions[0], self._function(*positions[0])
+        best_values = self._objective(population.best_values)[neighbors]
+        best = neighbors[np.arange(len(population)), np.argmin(best_values, axis=1)]
 
-        return Generation(positions, best)
+        return population.best_vectors[best]
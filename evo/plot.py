@@ -3,6 +3,13 @@ import matplotlib.animation as animation
 import numpy as np
 
 class EvoPlot():
+    """Animates the populations of a run.
+
+    generations is a sequence of Generation tuples: the generations attribute of
+    an algorithm, or a HistoryReader for a history written to disk, which is
+    read frame by frame.
+    """
+
     def __init__(self, generations):
         self.generations = generations
 
@@ -21,13 +28,14 @@ class EvoPlot():
         min_y = 0
         max_y = 0
 
-        for population in [i.population for i in generations]:
-            for x, y in population:
-                min_x = min(min_x, x)
-                max_x = max(max_x, x)
+        for generation in generations:
+            x, y = np.asarray(generation.population).T
+
+            min_x = min(min_x, x.min())
+            max_x = max(max_x, x.max())
 
-                min_y = min(min_y, y)
-                max_y = max(max_y, y)
+            min_y = min(min_y, y.min())
+            max_y = max(max_y, y.max())
 
         plt.xlim(min_x, max_x)
         plt.ylim(min_y, max_y)
@@ -76,14 +84,7 @@ class EvoPlot():
         return self.population_line,
 
     def update_population(self, num):
-        population = self.generations[num].population
-
-        x_values = []
-        y_values = []
-
-        for x, y in population:
-            x_values.append(x)
-            y_values.append(y)
+        x_values, y_values = np.asarray(self.generations[num].population).T
 
         self.population_line.set_data(x_values, y_values)
 
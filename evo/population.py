@@ -0,0 +1,82 @@
+import numpy as np
+
+class Population(object):
+    """Struct-of-arrays storage for a population.
+
+    Each individual is a row: its vector is a row of the vectors matrix and its
+    cached objective value an entry of values, which is nan while the vector has
+    not been evaluated. Algorithms add their own per-individual fields, e.g.
+    velocities or trial counters, which are kept aligned with the rows when the
+    population is reordered.
+    """
+
+    def __init__(self, vectors, dtype=None):
+        self.vectors = np.array(vectors, dtype=dtype)
+        self.values = np.full(len(self.vectors), np.nan)
+
+        self._fields = ['vectors', 'values']
+
+    def add_field(self, name, shape=(), dtype=float, fill=0):
+        """Adds a per-individual field, set to fill on every row.
+
+        shape is the shape of the field on a single row; use () for scalars or
+        (population.dimensions,) for vectors.
+        """
+
+        setattr(self, name, np.full((len(self),) + tuple(shape), fill, dtype))
+
+        self._fields.append(name)
+
+    def set_vectors(self, rows, vectors, values=None):
+        """Assigns new vectors to some rows.
+
+        The cached values of the rows are replaced by values, or invalidated if
+        these are not known.
+        """
+
+        self.vectors[rows] = vectors
+
+        if values is None:
+            self.values[rows] = np.nan
+        else:
+            self.values[rows] = values
+
+    def invalidate(self, rows=slice(None)):
+        """Drops the cached values of some rows, as their vectors changed."""
+
+        self.values[rows] = np.nan
+
+    def reorder(self, order):
+        """Rearranges the rows of every field; order may drop or repeat rows."""
+
+        for name in self._fields:
+            setattr(self, name, getattr(self, name)[order])
+
+    def take(self, rows):
+        """Returns a new population with a copy of some rows."""
+
+        population = Population.__new__(Population)
+        population._fields = list(self._fields)
+
+        for name in self._fields:
+            setattr(population, name, getattr(self, name)[rows].copy())
+
+        return population
+
+    def append(self, other):
+        """Appends the rows of other, which must have the same fields."""
+
+        for name in self._fields:
+            setattr(self, name, np.concatenate((getattr(self, name),
+                                                getattr(other, name))))
+
+    @property
+    def dimensions(self):
+        return self.vectors.shape[1]
+
+    @property
+    def dtype(self):
+        return self.vectors.dtype
+
+    def __len__(self):
+        return len(self.vectors)
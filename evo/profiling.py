@@ -0,0 +1,240 @@
+import json
+from timeit import default_timer
+
+from tools import atomic_replace
+
+class Profiler(object):
+    """Times the phases of an algorithm and reports each generation to some
+    observers.
+
+    The phases are the methods named in the _PHASES attribute of the algorithm
+    class, e.g. _evolve, _sort_population or _evaluate_vectors. While attached,
+    each of them is replaced on the algorithm instance by a wrapper adding up
+    its time and calls; times are inclusive, so _evolve includes the
+    evaluations made within it. Nothing is wrapped while the profiler is not
+    attached, so a run without a profiler costs nothing more.
+
+    After each generation, the observers are called with the profiler and a
+    record, a dict of the generation number, its best value, its wall-clock
+    time, the time and calls of each phase in it, and the counters of the run:
+    the evaluations and, for algorithms with a cache of values, its hits,
+    misses and evictions. A record covers the work since the previous one, so
+    it includes the recording of the previous generation in the history.
+
+    Arguments:
+    observers -- callables taking the profiler and a record, e.g. a
+                 JsonLinesWriter or a PrometheusFile
+    """
+
+    def __init__(self, *observers):
+        self.observers = list(observers)
+
+        self.algorithm = None
+        self.name = None
+        self.phases = ()
+
+        # time and calls of each phase, in the whole run and in the current
+        # generation
+        self.totals = {}
+        self._current = {}
+
+        self.generations = 0
+        self.counters = {}
+
+    def attach(self, algorithm):
+        """Starts timing the phases of an algorithm."""
+
+        self.detach()
+
+        self.algorithm = algorithm
+        self.name = type(algorithm).__name__
+        self.phases = tuple(algorithm._PHASES) + ('_get_state',)
+
+        for name in algorithm._PHASES:
+            setattr(algorithm, name, self._timed(name, getattr(algorithm, name)))
+
+        # a State is made once per generation, so it marks the end of one
+        algorithm._get_state = self._reporting(algorithm._get_state)
+
+        algorithm._profiler = self
+
+        self._last_time = default_timer()
+
+    def detach(self):
+        """Stops timing the algorithm, if any, and closes the observers."""
+
+        algorithm = self.algorithm
+
+        if algorithm is None:
+            return
+
+        for name in self.phases:
+            del algorithm.__dict__[name]
+
+        algorithm._profiler = None
+
+        self.algorithm = None
+        self.phases = ()
+
+        for observer in self.observers:
+            if hasattr(observer, 'close'):
+                observer.close()
+
+    def _timed(self, name, method):
+        entry = self._current.setdefault(name, [0.0, 0])
+        self.totals.setdefault(name, [0.0, 0])
+
+        def timed(*args, **kwargs):
+            start = default_timer()
+
+            try:
+                return method(*args, **kwargs)
+            finally:
+                entry[0] += default_timer() - start
+                entry[1] += 1
+
+        return timed
+
+    def _reporting(self, get_state):
+        def reporting(*args, **kwargs):
+            state = get_state(*args, **kwargs)
+
+            self._report(state)
+
+            return state
+
+        return reporting
+
+    def _report(self, state):
+        now = default_timer()
+
+        phases = {}
+
+        for name, entry in self._current.items():
+            total = self.totals[name]
+            total[0] += entry[0]
+            total[1] += entry[1]
+
+            phases[name.lstrip('_')] = {'time': entry[0], 'calls': entry[1]}
+
+            # the wrappers keep a reference to the entries
+            entry[0] = 0.0
+            entry[1] = 0
+
+        self.generations += 1
+        self.counters = _counters(self.algorithm)
+
+        record = {
+            'generation': int(state.generation),
+            'value': float(state.value),
+            'time': now - self._last_time,
+            'phases': phases,
+            'counters': self.counters
+        }
+
+        for observer in self.observers:
+            observer(self, record)
+
+        self._last_time = default_timer()
+
+    def prometheus(self, prefix='evo'):
+        """Returns the totals of the run in the Prometheus text format."""
+
+        labels = 'algorithm="%s"' % self.name
+
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+
+            for sample_labels, value in samples:
+                lines.append('%s_%s{%s} %r' % (prefix, name, sample_labels,
+                                               float(value)))
+
+        phases = sorted(self.totals.items())
+
+        metric('phase_seconds_total', 'counter',
+               'Time spent in each phase of the algorithm.',
+               [('%s,phase="%s"' % (labels, name.lstrip('_')), total[0])
+                for name, total in phases])
+        metric('phase_calls_total', 'counter',
+               'Calls to each phase of the algorithm.',
+               [('%s,phase="%s"' % (labels, name.lstrip('_')), total[1])
+                for name, total in phases])
+        metric('generations_total', 'counter', 'Generations done.',
+               [(labels, self.generations)])
+
+        for name, value in sorted(self.counters.items()):
+            metric(name + '_total', 'counter', 'Total %s of the run.'
+                                               % name.replace('_', ' '),
+                   [(labels, value)])
+
+        return '\n'.join(lines) + '\n'
+
+class JsonLinesWriter(object):
+    """Appends each record of a Profiler as a line of JSON to a file."""
+
+    def __init__(self, path):
+        self.path = path
+
+        self._file = None
+
+    def __call__(self, profiler, record):
+        if self._file is None:
+            self._file = open(self.path, 'a')
+
+        self._file.write(json.dumps(record, sort_keys=True) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class PrometheusFile(object):
+    """Writes the totals of a Profiler to a file in the Prometheus text format
+    every few generations, e.g. for the textfile collector of the node
+    exporter. The file is replaced atomically, so it is never read half
+    written.
+
+    Arguments:
+    path -- file where the metrics are written
+    every -- number of generations between writes (default 1)
+    """
+
+    def __init__(self, path, every=1):
+        self.path = path
+        self.every = every
+
+        self._profiler = None
+
+    def __call__(self, profiler, record):
+        self._profiler = profiler
+
+        if profiler.generations % self.every == 0:
+            self.write()
+
+    def write(self):
+        if self._profiler is None:
+            return
+
+        text = self._profiler.prometheus()
+
+        atomic_replace(self.path, lambda f: f.write(text))
+
+    def close(self):
+        # the last generations may not have been written yet
+        self.write()
+
+def _counters(algorithm):
+    counters = {'evaluations': algorithm.evaluations}
+
+    cache = getattr(algorithm, 'cache', None)
+
+    if cache is not None:
+        counters['cache_hits'] = cache.hits
+        counters['cache_misses'] = cache.misses
+        counters['cache_evictions'] = cache.evictions
+
+    return counters
@@ -0,0 +1,180 @@
+import abc
+import time
+
+class Criterion(object):
+    """A rule to stop a run before its maximum number of generations.
+
+    Criteria are started when the run starts and then checked after each
+    generation with its State; check returns the reason to stop, or None to go
+    on. They can be combined with | (stop when any is met) and & (stop when all
+    are met).
+    """
+
+    __metaclass__ = abc.ABCMeta
+
+    reason = None
+
+    def start(self, algorithm):
+        pass
+
+    @abc.abstractmethod
+    def check(self, state, algorithm):
+        return
+
+    def __or__(self, other):
+        return AnyOf(self, other)
+
+    def __and__(self, other):
+        return AllOf(self, other)
+
+class AnyOf(Criterion):
+    """Stops when any of the criteria is met; without criteria it never stops."""
+
+    def __init__(self, *criteria):
+        self.criteria = criteria
+
+    def start(self, algorithm):
+        for criterion in self.criteria:
+            criterion.start(algorithm)
+
+    def check(self, state, algorithm):
+        # every criterion is checked, as some keep track of the run
+        reasons = [criterion.check(state, algorithm)
+                   for criterion in self.criteria]
+
+        for reason in reasons:
+            if reason:
+                return reason
+
+class AllOf(AnyOf):
+    """Stops when all the criteria are met at once."""
+
+    def check(self, state, algorithm):
+        reasons = [criterion.check(state, algorithm)
+                   for criterion in self.criteria]
+
+        if reasons and all(reasons):
+            return ' and '.join(reasons)
+
+class MaxEvaluations(Criterion):
+    """Stops once the objective function has been evaluated count times.
+
+    The count is checked after each generation, so the run may go over it by
+    up to the evaluations of a generation, or of a chemotaxis step in
+    BacterialForaging.
+    """
+
+    reason = 'max_evaluations'
+
+    def __init__(self, count):
+        self.count = count
+
+    def check(self, state, algorithm):
+        if state.evaluations >= self.count:
+            return self.reason
+
+class Stall(Criterion):
+    """Stops after some generations without improving the best value.
+
+    An improvement must be greater than tolerance to count.
+    """
+
+    reason = 'stall'
+
+    def __init__(self, generations, tolerance=0):
+        self.generations = generations
+        self.tolerance = tolerance
+
+    def start(self, algorithm):
+        self._best = None
+        self._stalled = 0
+
+    def check(self, state, algorithm):
+        value = algorithm._objective(state.value)
+
+        if self._best is None or value < self._best - self.tolerance:
+            self._best = value
+            self._stalled = 0
+        else:
+            self._stalled += 1
+
+        if self._stalled >= self.generations:
+            return self.reason
+
+class TargetValue(Criterion):
+    """Stops once the best value reaches target, give or take tolerance."""
+
+    reason = 'target'
+
+    def __init__(self, target, tolerance=0):
+        self.target = target
+        self.tolerance = tolerance
+
+    def check(self, state, algorithm):
+        # the objective is minimized for both minimization and maximization
+        # problems
+        value = algorithm._objective(state.value)
+
+        if value <= algorithm._objective(self.target) + self.tolerance:
+            return self.reason
+
+class TimeLimit(Criterion):
+    """Stops once the run has taken some seconds of wall-clock time."""
+
+    reason = 'time_limit'
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def start(self, algorithm):
+        self._deadline = time.time() + self.seconds
+
+    def check(self, state, algorithm):
+        if time.time() >= self._deadline:
+            return self.reason
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+
+        # the time left is pickled instead of the deadline, so a run resumed
+        # from a checkpoint gets the time it had left
+        if '_deadline' in state:
+            state['_deadline'] -= time.time()
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        if '_deadline' in state:
+            self._deadline += time.time()
+
+class DiversityCollapse(Criterion):
+    """Stops when the population has converged to a point.
+
+    The diversity is the standard deviation of the solutions, averaged over the
+    dimensions; the run stops once it falls below threshold.
+    """
+
+    reason = 'diversity'
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def check(self, state, algorithm):
+        if algorithm.diversity() < self.threshold:
+            return self.reason
+
+def create_termination(termination):
+    """Returns the Criterion for the termination option of optimize.
+
+    termination may be None, a Criterion, or a list of criteria, meaning any of
+    them.
+    """
+
+    if termination is None:
+        return AnyOf()
+    elif isinstance(termination, Criterion):
+        return termination
+    else:
+        return AnyOf(*termination)
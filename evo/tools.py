@@ -1,18 +1,84 @@
-import random
-from collections import namedtuple
+import os
+from collections import namedtuple, OrderedDict
+
+import numpy as np
 
 Interval = namedtuple('Interval', ['min', 'max'])
 
+def seed_words(seed=None):
+    """Returns what a RandomState is seeded with for seed, an int or a
+    sequence of ints; None seeds it from the OS entropy.
+
+    Where numpy has SeedSequence, the seed is mixed through it, so similar
+    seeds give unrelated streams.
+    """
+
+    if seed is None or not hasattr(np.random, 'SeedSequence'):
+        return seed
+
+    return np.random.SeedSequence(seed).generate_state(4)
+
+def create_random(seed=None):
+    """Returns a new random stream, a RandomState, seeded with seed."""
+
+    return np.random.RandomState(seed_words(seed))
+
+def atomic_replace(path, write, mode='w'):
+    """Writes a file through write, a function taking the open file, to a
+    temporary file which then replaces path, so path is never left half
+    written.
+    """
+
+    temporary = path + '.tmp'
+
+    with open(temporary, mode) as f:
+        write(f)
+
+        f.flush()
+        os.fsync(f.fileno())
+
+    # rename can't replace an existing file on Windows
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+
+    os.rename(temporary, path)
+
+def spawn_seeds(random, count):
+    """Draws from a random stream the seeds of count independent streams,
+    e.g. for parallel runs.
+    """
+
+    return [list(words) for words in random.randint(2**32, size=(count, 4),
+                                                    dtype=np.uint32)]
+
+# an item of a RandomSelector; defined here, rather than in the class, so
+# selectors can be pickled, e.g. in a checkpoint
+Item = namedtuple('Item', ['data', 'weight'])
+
 class RandomSelector:
-    Item = namedtuple('Item', ['data', 'weight'])
+    """Picks items at random, with probabilities proportional to their weights.
+
+    The cumulative sums of the weights are computed once after the items
+    change, so each pick is a binary search over them.
+
+    Arguments:
+    random -- the random stream the picks are drawn from, e.g. the one of an
+              algorithm (default the global numpy stream)
+    """
+
+    Item = Item
+
+    def __init__(self, random=None):
+        self.random = random or np.random
 
-    def __init__(self):
         self.clear()
 
     def add(self, data, weight):
         self.items.append(self.Item(data, weight))
         self.total_weight += weight
 
+        self._table = None
+
     def assign(self, items):
         self.clear()
 
@@ -22,37 +88,181 @@ class RandomSelector:
         self.items = []
         self.total_weight = 0
 
-    def choose(self):
-        picked = self.__choose(self.items, self.total_weight)
+        self._table = None
+
+    def choose(self, count=None):
+        """Picks an item, or a list of count items, with replacement."""
+
+        if not self.items:
+            return None if count is None else []
 
-        if picked: return picked.data
+        picked = self._pick(1 if count is None else count)
+
+        if count is None:
+            return self.items[picked[0]].data
+
+        return [self.items[i].data for i in picked]
 
     def sample(self, count):
-        choosen = []
-        items = self.items[:]
+        """Picks count distinct items, or all of them if there are fewer.
+
+        The items are drawn as if they were picked one after the other, each
+        time from the ones not picked yet.
+        """
+
+        # each item gets a random key which is larger the larger its weight,
+        # and the items with the largest keys are taken (Efraimidis-Spirakis)
+        weights = self._weights()
+
+        with np.errstate(divide='ignore'):
+            keys = np.log(self.random.random_sample(len(weights))) / weights
+
+        picked = np.argsort(-keys, kind='mergesort')[:count]
+
+        return [self.items[i].data for i in picked]
+
+    def _weights(self):
+        return np.array([item.weight for item in self.items], dtype=float)
+
+    def _get_table(self):
+        if self._table is None:
+            self._table = self._build_table()
+
+        return self._table
+
+    def _build_table(self):
+        """Returns what the picks are computed from, once the items change."""
+
+        return np.cumsum(self._weights())
+
+    def _pick(self, count):
+        """Returns the indices of count items picked with replacement."""
 
-        while len(choosen) < count and len(items) > 0:
-            picked = self.__choose(items)
+        cumulative = self._get_table()
+        total = cumulative[-1]
 
-            choosen.append(picked.data)
-            items.remove(picked)
+        if total <= 0:
+            return self.random.randint(len(self.items), size=count)
 
-        return choosen
+        picked = np.searchsorted(cumulative,
+                                 self.random.uniform(0, total, count),
+                                 side='right')
 
-    def __choose(self, items, total_weight=None):
-        if not total_weight:
-            total_weight = sum([i.weight for i in items])
+        # guards against rounding at the end of the cumulative sums
+        return np.minimum(picked, len(self.items) - 1)
 
-        accumulated = 0
-        rand = random.uniform(0, total_weight)
+class StochasticUniversalSelector(RandomSelector):
+    """A RandomSelector whose batched picks use stochastic universal sampling.
 
-        picked = None
+    The count items are picked with evenly spaced pointers over the cumulative
+    weights, from a single random offset, so each item is picked a number of
+    times as close as possible to the expected one. The picks are shuffled.
+    """
 
-        for item in items:
-            accumulated += item.weight
+    def _pick(self, count):
+        cumulative = self._get_table()
+        total = cumulative[-1]
 
-            if accumulated >= rand:
-                picked = item
-                break
+        if total <= 0:
+            return self.random.randint(len(self.items), size=count)
+
+        spacing = float(total) / count
+        pointers = self.random.uniform(0, spacing) + spacing * np.arange(count)
+
+        picked = np.minimum(np.searchsorted(cumulative, pointers, side='right'),
+                            len(self.items) - 1)
+
+        self.random.shuffle(picked)
 
         return picked
+
+class TournamentSelector(RandomSelector):
+    """Picks the item with the largest weight among size items taken at random.
+
+    The weights only need to be comparable, so they may be negative.
+
+    Arguments:
+    size -- number of items taking part in each tournament (default 2)
+    random -- as for RandomSelector
+    """
+
+    def __init__(self, size=2, random=None):
+        self.size = size
+
+        RandomSelector.__init__(self, random)
+
+    def sample(self, count):
+        """Picks count distinct items, or all of them if there are fewer.
+
+        Each item is the winner of a tournament among the items not picked yet.
+        """
+
+        weights = self._weights()
+        remaining = np.arange(len(weights))
+
+        picked = []
+
+        while len(picked) < count and len(remaining):
+            entrants = self.random.randint(len(remaining), size=self.size)
+            winner = entrants[np.argmax(weights[remaining[entrants]])]
+
+            picked.append(remaining[winner])
+            remaining = np.delete(remaining, winner)
+
+        return [self.items[i].data for i in picked]
+
+    def _build_table(self):
+        return self._weights()
+
+    def _pick(self, count):
+        weights = self._get_table()
+
+        entrants = self.random.randint(len(weights), size=(count, self.size))
+
+        return entrants[np.arange(count), np.argmax(weights[entrants], axis=1)]
+
+class LRUCache:
+    """A bounded mapping that evicts the least recently used entries.
+
+    Keeps count of the lookups that hit and miss, and of the evicted entries.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+
+        self.clear()
+
+    def get(self, key, default=None):
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            self.misses += 1
+
+            return default
+
+        # reinsert the entry to mark it as the most recently used
+        self._items[key] = value
+        self.hits += 1
+
+        return value
+
+    def put(self, key, value):
+        self._items.pop(key, None)
+        self._items[key] = value
+
+        if len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._items = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
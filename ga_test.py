@@ -5,7 +5,7 @@ from evo.plot import EvoPlot
 if __name__ == '__main__':
     ga = BasicBinaryGA()
 
-    best = ga.optimize(function=rastrigin)
+    best = ga.optimize(function=rastrigin, dimensions=2)
 
     plot = EvoPlot(ga.generations)
 
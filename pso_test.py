@@ -5,7 +5,7 @@ from evo.plot import EvoPlot
 if __name__ == '__main__':
     pso = ParticleSwarm()
 
-    best = pso.optimize(function=rastrigin)
+    best = pso.optimize(function=rastrigin, dimensions=2)
 
     plot = EvoPlot(pso.generations)
 